@@ -0,0 +1,163 @@
+"""
+Compare validating a large EPD patient page through `json.loads` +
+`model_validate` with validating the raw bytes through `model_validate_json`,
+and with the slim model of the summary view.
+
+Run from the backend folder:
+    python -m benchmarks.decode_patients --patients 1000
+"""
+
+import argparse
+import json
+import timeit
+import tracemalloc
+from functools import partial
+from typing import Any, Callable
+
+from project.db.models.patient import (
+    PaginatedPatientResponse,
+    PaginatedPatientSummaryResponse,
+)
+
+
+def build_user(user_id: int) -> dict[str, Any]:
+    return {
+        "id": user_id,
+        "firstName": "Anna",
+        "lastName": "de Vries",
+        "email": f"user{user_id}@dvu.nl",
+        "role": "DOCTOR",
+    }
+
+
+def build_patient(patient_id: int) -> dict[str, Any]:
+    author = {"id": 1, "firstName": "Anna", "lastName": "de Vries"}
+    return {
+        **build_user(patient_id),
+        "hospitalNumber": f"HN{patient_id:08d}",
+        "dateOfBirth": "1980-01-01",
+        "sex": "FEMALE",
+        "phone": "0612345678",
+        "addressLine1": "Johanna Westerdijkplein 75",
+        "city": "Den Haag",
+        "postalCode": "2521EN",
+        "status": "ACTIVE",
+        "updatedAt": "2025-01-01T00:00:00.000Z",
+        "createdById": 1,
+        "createdBy": build_user(1),
+        "encounters": [
+            {
+                "id": patient_id * 10 + index,
+                "type": "INPATIENT",
+                "status": "COMPLETED",
+                "start": "2025-01-01T08:00:00.000Z",
+                "end": "2025-01-02T08:00:00.000Z",
+                "reason": "Observatie",
+                "patientId": patient_id,
+                "location": "Afdeling 3B",
+                "createdById": 1,
+            }
+            for index in range(3)
+        ],
+        "diagnoses": [
+            {
+                "id": patient_id,
+                "code": "J18.9",
+                "description": "Pneumonie",
+                "type": "PRIMARY",
+                "onset": "2025-01-01",
+                "patientId": patient_id,
+                "encounterId": patient_id * 10,
+                "authorId": 1,
+                "author": author,
+            }
+        ],
+        "allergies": [
+            {
+                "id": patient_id,
+                "substance": "Penicilline",
+                "reaction": "Huiduitslag",
+                "severity": "MILD",
+                "notedAt": "2020-01-01",
+                "patientId": patient_id,
+            }
+        ],
+        "insurancePolicies": [
+            {
+                "id": patient_id,
+                "policyNumber": f"P{patient_id}",
+                "status": "ACTIVE",
+                "startDate": "2020-01-01",
+                "patientId": patient_id,
+                "insurerId": 1,
+                "insurer": {
+                    "id": 1,
+                    "name": "Zorgverzekeraar",
+                    "code": "ZV",
+                    "phone": "0701234567",
+                    "email": "info@zv.nl",
+                    "website": "https://zv.nl",
+                },
+            }
+        ],
+    }
+
+
+def build_page(patients: int) -> bytes:
+    page = {
+        "patients": [build_patient(index) for index in range(1, patients + 1)],
+        "pagination": {
+            "page": 1,
+            "limit": patients,
+            "total": patients,
+            "totalPages": 1,
+        },
+    }
+    return json.dumps(page).encode()
+
+
+def via_dict(raw: bytes) -> PaginatedPatientResponse:
+    return PaginatedPatientResponse.model_validate(json.loads(raw))
+
+
+def via_bytes(raw: bytes) -> PaginatedPatientResponse:
+    return PaginatedPatientResponse.model_validate_json(raw)
+
+
+def via_summary(raw: bytes) -> PaginatedPatientSummaryResponse:
+    return PaginatedPatientSummaryResponse.model_validate_json(raw)
+
+
+def peak_allocation(decode: Callable[[bytes], Any], raw: bytes) -> int:
+    tracemalloc.start()
+    decode(raw)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--patients", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    raw = build_page(args.patients)
+    print(f"page of {args.patients} patients, {len(raw) / 1024:.0f} KiB")  # noqa: T201
+
+    decoders = {
+        "json.loads + model_validate": via_dict,
+        "model_validate_json": via_bytes,
+        "summary view": via_summary,
+    }
+    for name, decode in decoders.items():
+        run = partial(decode, raw)
+        seconds = min(timeit.repeat(run, number=1, repeat=args.repeat))
+        peak = peak_allocation(decode, raw)
+        print(  # noqa: T201
+            f"{name:<28} {seconds * 1000:8.1f} ms  peak {peak / 1024:8.0f} KiB"
+        )
+
+
+if __name__ == "__main__":
+    main()
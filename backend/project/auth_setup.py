@@ -1,6 +1,17 @@
 from fastapi_plugin import Auth0FastAPI
 
 from project.config import get_settings
+from project.jwks_cache import JWKSCache
 
 settings = get_settings()
-auth0 = Auth0FastAPI(domain=settings.auth0_domain, audience=settings.auth0_api_audience)
+jwks_cache = JWKSCache(
+    domain=settings.auth0_domain,
+    refresh_interval=settings.jwks_refresh_interval,
+    min_refresh_interval=settings.jwks_min_refresh_interval,
+)
+auth0 = Auth0FastAPI(
+    domain=settings.auth0_domain,
+    audience=settings.auth0_api_audience,
+    custom_fetch=jwks_cache.fetch,
+)
+jwks_cache.bind(auth0.api_client)
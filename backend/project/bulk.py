@@ -0,0 +1,105 @@
+from functools import lru_cache
+from typing import Any, Awaitable, Callable, TypeVar
+
+from fastapi import HTTPException, Request, status
+from fastapi.exceptions import RequestValidationError
+from pydantic import BaseModel, TypeAdapter, ValidationError
+
+from project.config import get_settings
+from project.db.models.batch import BulkItemResult, BulkResponse
+
+ModelT = TypeVar("ModelT", bound=BaseModel)
+
+NDJSON_MEDIA_TYPES = {"application/x-ndjson", "application/ndjson"}
+
+
+@lru_cache
+def _list_adapter(model: type[BaseModel]) -> TypeAdapter[list[Any]]:
+    return TypeAdapter(list[model])  # type: ignore[valid-type]
+
+
+def _validate(body: bytes, model: type[ModelT], ndjson: bool) -> list[ModelT]:
+    if not ndjson:
+        return _list_adapter(model).validate_json(body)
+
+    items: list[ModelT] = []
+    errors: list[Any] = []
+    lines = (line for line in body.splitlines() if line.strip())
+    for index, line in enumerate(lines):
+        try:
+            items.append(model.model_validate_json(line))
+        except ValidationError as exc:
+            for error in exc.errors(include_url=False):
+                errors.append({**error, "loc": (index, *error["loc"])})
+    if errors:
+        raise RequestValidationError(errors)
+    return items
+
+
+def bulk_items(
+    model: type[ModelT],
+) -> Callable[[Request], Awaitable[list[ModelT]]]:
+    """
+    Dependency validating a bulk request body, a JSON array or NDJSON (one
+    object per line), into a list of `model`
+    """
+
+    async def dep(request: Request) -> list[ModelT]:
+        content_type = request.headers.get("content-type", "")
+        ndjson = content_type.split(";")[0].strip() in NDJSON_MEDIA_TYPES
+        body = await request.body()
+
+        try:
+            items = _validate(body, model, ndjson)
+        except ValidationError as exc:
+            raise RequestValidationError(exc.errors(include_url=False)) from exc
+
+        max_items = get_settings().bulk_max_items
+        if not items or len(items) > max_items:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"A bulk request takes 1 to {max_items} items",
+            )
+        return items
+
+    return dep
+
+
+def succeeded(results: list[ModelT | HTTPException]) -> list[ModelT]:
+    """
+    Results of the items of a bulk request that succeeded
+    """
+    return [result for result in results if not isinstance(result, HTTPException)]
+
+
+def succeeded_ids(results: list[BaseModel | HTTPException]) -> list[int]:
+    """
+    Ids of the items of a bulk request that succeeded
+    """
+    ids = (getattr(result, "id", None) for result in succeeded(results))
+    return [item_id for item_id in ids if item_id is not None]
+
+
+def summarize_bulk(
+    results: list[BaseModel | HTTPException], success_status: int
+) -> BulkResponse:
+    """
+    Per item status of a bulk request, in the order of the request
+    """
+    items: list[BulkItemResult] = []
+    for index, result in enumerate(results):
+        if isinstance(result, HTTPException):
+            items.append(
+                BulkItemResult(
+                    index=index, status=result.status_code, detail=str(result.detail)
+                )
+            )
+        else:
+            items.append(
+                BulkItemResult(
+                    index=index, status=success_status, id=getattr(result, "id", None)
+                )
+            )
+
+    failed = sum(1 for item in items if item.status != success_status)
+    return BulkResponse(succeeded=len(items) - failed, failed=failed, results=items)
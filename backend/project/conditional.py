@@ -0,0 +1,45 @@
+import hashlib
+import time
+
+from fastapi import Request, Response, status
+from pydantic import BaseModel
+
+from project.timing import record_timing
+
+NOT_MODIFIED_RESPONSE = {
+    status.HTTP_304_NOT_MODIFIED: {"description": "Not modified since the ETag"}
+}
+
+
+def compute_etag(body: bytes) -> str:
+    """
+    Strong ETag of a serialized payload
+    """
+    return f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """
+    Whether an If-None-Match header matches `etag` (weak comparison, RFC 9110)
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = (tag.strip().removeprefix("W/") for tag in if_none_match.split(","))
+    return etag.removeprefix("W/") in candidates
+
+
+def conditional_response(request: Request, model: BaseModel) -> Response:
+    """
+    Serialize `model` with its ETag, or answer 304 without a body when the
+    client already has this version
+    """
+    started = time.perf_counter()
+    body = model.model_dump_json(by_alias=True).encode()
+    record_timing("serialize", time.perf_counter() - started)
+    headers = {"ETag": compute_etag(body)}
+
+    if etag_matches(request.headers.get("if-none-match"), headers["ETag"]):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
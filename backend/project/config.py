@@ -7,6 +7,110 @@ class Settings(BaseSettings):
     auth0_domain: str
     auth0_api_audience: str
 
+    # Verified bearer tokens are cached until they expire
+    token_cache_max_size: int = 1024
+
+    # Signing keys of Auth0, refreshed in the background and on an unknown kid
+    jwks_refresh_interval: float = 600.0
+    jwks_min_refresh_interval: float = 30.0
+
+    # The token of /auth/login is renewed this many seconds before it expires
+    m2m_token_refresh_margin: float = 60.0
+
+    # Read-through cache of EPD GET responses: "memory", "redis" or "none"
+    response_cache_backend: str = "memory"
+    response_cache_max_size: int = 2048
+    redis_url: str = "redis://localhost:6379/0"
+    patients_cache_ttl: float = 30.0
+    encounters_cache_ttl: float = 15.0
+
+    # ETags of EPD responses, kept with their body to send conditional requests
+    # to EPD, bounded by count and by the total size of the bodies in bytes
+    upstream_validators_max_size: int = 1024
+    upstream_validators_max_bytes: int = 16 * 1024 * 1024
+    upstream_validators_ttl: float = 600.0
+
+    # Seconds each part of the patient chart may take before it is left out,
+    # items requested per EPD page and items kept per part of the chart
+    chart_part_timeout: float = 2.0
+    chart_page_size: int = 100
+    chart_part_max_items: int = 500
+
+    # Unread / total mail counters per user, kept up to date by the mail writes
+    # of the gateway and refetched from the mail service after the ttl
+    mail_count_cache_max_size: int = 4096
+    mail_count_cache_ttl: float = 30.0
+
+    # Push channel of /events: frames buffered per client before it is dropped
+    # and seconds between keepalive comments on an idle stream. Mail events
+    # only reach the client whose token has the mail user id in this claim.
+    events_queue_size: int = 64
+    events_heartbeat_interval: float = 15.0
+    events_mail_user_claim: str = "sub"
+
+    # Profiles of requests sent with X-Profile: 1 (scope debug:profile)
+    profile_sample_interval: float = 0.001
+    profile_max_stored: int = 32
+    profile_ttl: float = 600.0
+
+    # Traces are exported to this OTLP/HTTP collector, e.g.
+    # http://localhost:4318, left unset only the traceparent is propagated
+    otlp_endpoint: str | None = None
+    tracing_service_name: str = "dvu-gateway"
+    tracing_sample_ratio: float = 1.0
+    tracing_max_queue: int = 2048
+    tracing_batch_size: int = 512
+    tracing_export_interval: float = 5.0
+
+    # Upstream calls a batch lookup or bulk write runs at once
+    batch_concurrency: int = 10
+    bulk_max_items: int = 1000
+
+    # Connection pools for the upstream services (EPD / mail)
+    epd_max_connections: int = 100
+    epd_max_keepalive_connections: int = 20
+    epd_keepalive_expiry: float = 30.0
+    epd_http2: bool = False
+    mail_max_connections: int = 50
+    mail_max_keepalive_connections: int = 10
+    mail_keepalive_expiry: float = 30.0
+    mail_http2: bool = False
+    auth0_max_connections: int = 10
+    auth0_max_keepalive_connections: int = 5
+    auth0_keepalive_expiry: float = 30.0
+
+    # Timeouts in seconds per upstream, the write timeout follows the read one
+    epd_connect_timeout: float = 2.0
+    epd_read_timeout: float = 5.0
+    epd_pool_timeout: float = 1.0
+    mail_connect_timeout: float = 2.0
+    mail_read_timeout: float = 3.0
+    mail_pool_timeout: float = 1.0
+    auth0_connect_timeout: float = 3.0
+    auth0_read_timeout: float = 5.0
+    auth0_pool_timeout: float = 2.0
+
+    # Retries of idempotent EPD / mail GETs, at most a ratio of all calls
+    upstream_max_retries: int = 2
+    upstream_retry_backoff: float = 0.05
+    upstream_retry_budget_ratio: float = 0.1
+    upstream_retry_budget_min_per_second: float = 1.0
+
+    # Consecutive failures that stop calls to EPD / mail, and the seconds
+    # before a single probe call is let through again
+    upstream_breaker_failure_threshold: int = 5
+    upstream_breaker_recovery_time: float = 10.0
+
+    # Adaptive concurrency limit of the calls to EPD / mail, it grows up to the
+    # pool size while calls stay under the latency target. Calls over the limit
+    # wait in a queue and are rejected with 503 when it is full or too slow.
+    upstream_limit_initial: int = 20
+    upstream_limit_min: int = 2
+    upstream_limit_backoff: float = 0.9
+    upstream_latency_target: float = 0.5
+    upstream_queue_size: int = 100
+    upstream_queue_timeout: float = 1.0
+
 
 @lru_cache
 def get_settings() -> Settings:
@@ -0,0 +1,34 @@
+from typing import Optional
+
+from pydantic import BaseModel, Field
+
+from project.db.models.details import EncounterDetailResponse, PatientDetailResponse
+
+MAX_BATCH_SIZE = 200
+
+
+class BatchLookupRequest(BaseModel):
+    ids: list[int] = Field(..., min_length=1, max_length=MAX_BATCH_SIZE)
+
+
+class PatientBatchResponse(BaseModel):
+    items: dict[int, PatientDetailResponse]
+    errors: dict[int, str] = {}
+
+
+class EncounterBatchResponse(BaseModel):
+    items: dict[int, EncounterDetailResponse]
+    errors: dict[int, str] = {}
+
+
+class BulkItemResult(BaseModel):
+    index: int
+    status: int
+    id: Optional[int] = None
+    detail: Optional[str] = None
+
+
+class BulkResponse(BaseModel):
+    succeeded: int
+    failed: int
+    results: list[BulkItemResult]
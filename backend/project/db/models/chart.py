@@ -0,0 +1,96 @@
+from typing import Optional
+
+from pydantic import BaseModel
+
+from project.db.models.basemodel import DVUBaseModel, PaginationResponse
+from project.db.models.details import PatientDetailResponse
+from project.db.models.encounter import PaginatedEncounterResponse
+from project.db.models.enums import (
+    AppointmentStatusEnum,
+    LabResultStatusEnum,
+    MedicationStatusEnum,
+    VitalTypeEnum,
+)
+from project.db.models.mail import MailCountResponse
+
+
+class VitalResponse(DVUBaseModel):
+    type: VitalTypeEnum
+    value: str
+    unit: Optional[str] = None
+    measuredAt: str
+    patientId: int
+
+
+class LabResultResponse(DVUBaseModel):
+    testName: str
+    value: Optional[str] = None
+    unit: Optional[str] = None
+    referenceRange: Optional[str] = None
+    status: LabResultStatusEnum
+    takenAt: Optional[str] = None
+    reportedAt: Optional[str] = None
+    patientId: int
+    encounterId: Optional[int] = None
+    validatorId: Optional[int] = None
+
+
+class MedicationResponse(DVUBaseModel):
+    medicationName: str
+    dose: str
+    route: Optional[str] = None
+    frequency: Optional[str] = None
+    startDate: str
+    endDate: Optional[str] = None
+    status: MedicationStatusEnum
+    patientId: int
+    encounterId: Optional[int] = None
+    prescriberId: Optional[int] = None
+
+
+class AppointmentResponse(DVUBaseModel):
+    start: str
+    end: str
+    location: Optional[str] = None
+    reason: Optional[str] = None
+    status: AppointmentStatusEnum
+    patientId: int
+    clinicianId: Optional[int] = None
+
+
+class PaginatedVitalResponse(BaseModel):
+    vitals: list[VitalResponse]
+    pagination: PaginationResponse
+
+
+class PaginatedLabResultResponse(BaseModel):
+    labResults: list[LabResultResponse]
+    pagination: PaginationResponse
+
+
+class PaginatedMedicationResponse(BaseModel):
+    medications: list[MedicationResponse]
+    pagination: PaginationResponse
+
+
+class PaginatedAppointmentResponse(BaseModel):
+    appointments: list[AppointmentResponse]
+    pagination: PaginationResponse
+
+
+class PatientChartResponse(BaseModel):
+    """
+    Everything a patient chart shows. A part that failed or timed out is
+    None and its reason is listed in `errors`. A part with more items than
+    the chart keeps is cut off and listed in `truncated`.
+    """
+
+    patient: PatientDetailResponse
+    encounters: Optional[PaginatedEncounterResponse] = None
+    vitals: Optional[PaginatedVitalResponse] = None
+    labResults: Optional[PaginatedLabResultResponse] = None
+    medications: Optional[PaginatedMedicationResponse] = None
+    appointments: Optional[PaginatedAppointmentResponse] = None
+    mailCount: Optional[MailCountResponse] = None
+    errors: dict[str, str] = {}
+    truncated: list[str] = []
@@ -60,6 +60,15 @@ class InsurancePolicies(DVUBaseModel):
     insurer: Insurer
 
 
+# Nested relations that can be picked with `include=`
+PATIENT_RELATIONS = frozenset(
+    {"createdBy", "encounters", "diagnoses", "allergies", "insurancePolicies"}
+)
+ENCOUNTER_RELATIONS = frozenset(
+    {"patient", "createdBy", "medicalRecords", "diagnoses", "medicationOrders"}
+)
+
+
 class PatientDetailResponse(PatientResponse):
     createdBy: User
     encounters: List[EncounterResponse]
@@ -1,3 +1,5 @@
+from typing import Optional
+
 from pydantic import BaseModel
 
 from project.db.models.basemodel import DVUBaseModel, PaginationResponse
@@ -31,3 +33,4 @@ class EncounterListResponse(EncounterRead):
 class PaginatedEncounterResponse(BaseModel):
     encounters: list[EncounterListResponse]
     pagination: PaginationResponse
+    nextCursor: Optional[str] = None
@@ -22,6 +22,11 @@ class PatientStatusEnum(str, enum.Enum):
     DECEASED = "DECEASED"
 
 
+class PatientListViewEnum(str, enum.Enum):
+    FULL = "full"
+    SUMMARY = "summary"  # only the fields of `PatientRead`
+
+
 class EncounterTypeEnum(str, enum.Enum):
     INPATIENT = "INPATIENT"  # opname
     OUTPATIENT = "OUTPATIENT"  # poliklinisch
@@ -85,3 +90,33 @@ class InsuranceStatusEnum(str, enum.Enum):
     ACTIVE = "ACTIVE"
     ENDED = "ENDED"
     PENDING = "PENDING"
+
+
+class MailViewEnum(str, enum.Enum):
+    FULL = "full"
+    HEADERS = "headers"  # without the body
+
+
+class EventTopicEnum(str, enum.Enum):
+    MAILS = "mails"
+    PATIENTS = "patients"
+    ENCOUNTERS = "encounters"
+
+
+class EventActionEnum(str, enum.Enum):
+    CREATED = "created"
+    UPDATED = "updated"
+    READ = "read"  # mails only
+    DELETED = "deleted"
+
+
+class BreakerStateEnum(str, enum.Enum):
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+
+class RequestPriorityEnum(str, enum.Enum):
+    HIGH = "high"  # e.g. chart loads
+    NORMAL = "normal"
+    LOW = "low"  # exports and bulk writes, shed first
@@ -0,0 +1,16 @@
+from typing import Optional
+
+from pydantic import BaseModel, ConfigDict
+
+from project.db.models.enums import EventActionEnum, EventTopicEnum
+
+
+class EventOut(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+
+    topic: EventTopicEnum
+    action: EventActionEnum
+    id: Optional[str] = None  # changed item
+    ids: Optional[list[str]] = None  # changed items of a bulk request
+    userId: Optional[str] = None  # owner of a mail
+    patientId: Optional[int] = None  # patient of an encounter
@@ -0,0 +1,19 @@
+from pydantic import BaseModel
+
+from project.db.models.enums import BreakerStateEnum
+
+
+class UpstreamHealthResponse(BaseModel):
+    state: BreakerStateEnum
+    failures: int  # in a row
+    opened: int
+    retry_after: float
+    retries_exhausted: int
+    limit: float
+    in_flight: int
+    queued: int
+    shed: int
+
+
+class HealthResponse(BaseModel):
+    upstreams: dict[str, UpstreamHealthResponse]
@@ -2,9 +2,9 @@
 from __future__ import annotations
 
 from datetime import datetime
-from typing import List
+from typing import List, Optional
 
-from pydantic import BaseModel, ConfigDict, EmailStr, Field
+from pydantic import BaseModel, ConfigDict, EmailStr, Field, RootModel
 
 
 class MailBase(BaseModel):
@@ -31,9 +31,39 @@ class MailOut(BaseModel):
     updatedAt: datetime
 
 
+class MailHeaderOut(BaseModel):
+    # The mail service may still send the body, it is dropped
+    model_config = ConfigDict(populate_by_name=True, extra="ignore")
+
+    id: str
+    userId: str
+    from_: EmailStr = Field(..., alias="from")
+    to: EmailStr
+    subject: str
+    isRead: bool
+    createdAt: datetime
+    updatedAt: datetime
+
+
+class UserMailsOut(RootModel[List[MailOut]]):
+    # The mail service answers with the whole mailbox as a bare array
+    pass
+
+
+class UserMailHeadersOut(RootModel[List[MailHeaderOut]]):
+    pass
+
+
 class GetMailsByUserResponse(BaseModel):
     model_config = ConfigDict(extra="forbid")
     items: List[MailOut]
+    nextCursor: Optional[str] = None
+
+
+class GetMailHeadersByUserResponse(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+    items: List[MailHeaderOut]
+    nextCursor: Optional[str] = None
 
 
 class GetMailByIdResponse(MailOut):
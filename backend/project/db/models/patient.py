@@ -1,9 +1,19 @@
+from typing import Optional
+
 from pydantic import BaseModel
 
 from project.db.models.basemodel import PaginationResponse
 from project.db.models.details import PatientDetailResponse
+from project.db.models.patient_base import PatientRead
 
 
 class PaginatedPatientResponse(BaseModel):
     patients: list[PatientDetailResponse]
     pagination: PaginationResponse
+    nextCursor: Optional[str] = None
+
+
+class PaginatedPatientSummaryResponse(BaseModel):
+    patients: list[PatientRead]
+    pagination: PaginationResponse
+    nextCursor: Optional[str] = None
@@ -0,0 +1,186 @@
+import asyncio
+import time
+from collections import defaultdict
+from typing import AsyncIterator, Iterable
+
+from project.db.models.enums import EventTopicEnum
+from project.db.models.event import EventOut
+
+KEEPALIVE = b": keepalive\n\n"
+
+
+def encode_event(event: EventOut) -> bytes:
+    """
+    Server-Sent Events frame of an event
+    """
+    data = event.model_dump_json(exclude_none=True)
+    return f"event: {event.topic.value}.{event.action.value}\ndata: {data}\n\n".encode()
+
+
+class Subscription:
+    """
+    Bounded queue of frames for one connected client.
+    A client that falls too far behind is closed instead of buffering without
+    limit, it reconnects and refetches what it missed.
+    """
+
+    def __init__(
+        self,
+        topics: frozenset[EventTopicEnum],
+        max_size: int,
+        user_id: str | None = None,
+    ) -> None:
+        """
+        Args:
+            topics: topics the client listens to
+            max_size: frames kept for the client before it is closed
+            user_id: mail user the client only gets the mail events of,
+                None for the mail events of every user
+        """
+        self.topics = topics
+        self.user_id = user_id
+        self.closed = False
+        self._queue: asyncio.Queue[bytes | None] = asyncio.Queue(maxsize=max_size)
+
+    def accepts(self, event: EventOut) -> bool:
+        """
+        Whether the client may see an event of one of its topics
+        """
+        if event.topic != EventTopicEnum.MAILS or self.user_id is None:
+            return True
+        return event.userId == self.user_id
+
+    def push(self, frame: bytes) -> None:
+        """
+        Queue a frame without waiting, closing the subscription when it is full
+        """
+        if self.closed:
+            return
+        try:
+            self._queue.put_nowait(frame)
+        except asyncio.QueueFull:
+            self.close()
+
+    def close(self) -> None:
+        """
+        Drop the queued frames and end the stream of the client
+        """
+        if self.closed:
+            return
+        self.closed = True
+        while not self._queue.empty():
+            self._queue.get_nowait()
+        self._queue.put_nowait(None)
+
+    async def get(self, timeout: float) -> bytes | None:
+        """
+        Next frame, KEEPALIVE after `timeout` seconds without one and None
+        once the subscription is closed
+        """
+        try:
+            return await asyncio.wait_for(self._queue.get(), timeout)
+        except TimeoutError:
+            return KEEPALIVE
+
+
+class EventBroker:
+    """
+    In-process pub/sub of the changes made through the gateway.
+    Every event is encoded once and handed to the queues of the subscribers of
+    its topic, publishing never waits for a client. Events of other gateway
+    workers are not seen.
+    """
+
+    def __init__(self) -> None:
+        """
+        Create a broker without subscribers
+        """
+        self._subscribers: defaultdict[EventTopicEnum, set[Subscription]] = defaultdict(
+            set
+        )
+
+    def __len__(self) -> int:
+        """
+        Amount of connected clients
+        """
+        return len(set().union(*self._subscribers.values()))
+
+    def subscribe(
+        self,
+        topics: Iterable[EventTopicEnum],
+        max_size: int,
+        user_id: str | None = None,
+    ) -> Subscription:
+        """
+        Register a client for `topics`, see `Subscription` for `user_id`
+        """
+        subscription = Subscription(
+            frozenset(topics), max_size=max_size, user_id=user_id
+        )
+        for topic in subscription.topics:
+            self._subscribers[topic].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        """
+        Remove a client and close its subscription
+        """
+        for topic in subscription.topics:
+            self._subscribers[topic].discard(subscription)
+        subscription.close()
+
+    def publish(self, event: EventOut) -> None:
+        """
+        Fan an event out to the subscribers of its topic that may see it
+        """
+        subscribers = self._subscribers.get(event.topic)
+        if not subscribers:
+            return
+        frame = encode_event(event)
+        for subscription in list(subscribers):
+            if subscription.accepts(event):
+                subscription.push(frame)
+
+    def close(self) -> None:
+        """
+        End the streams of all clients, on shutdown
+        """
+        for subscribers in self._subscribers.values():
+            for subscription in subscribers:
+                subscription.close()
+        self._subscribers.clear()
+
+    async def stream(
+        self,
+        topics: Iterable[EventTopicEnum],
+        max_size: int,
+        heartbeat: float,
+        expires_at: float | None = None,
+        user_id: str | None = None,
+    ) -> AsyncIterator[bytes]:
+        """
+        Frames for one client, with a keepalive comment every `heartbeat`
+        seconds. The stream ends at `expires_at` (epoch seconds), the expiry
+        of the token it was opened with, so the client has to reconnect with
+        a valid token. See `Subscription` for `user_id`.
+        """
+        subscription = self.subscribe(topics, max_size=max_size, user_id=user_id)
+        try:
+            yield KEEPALIVE
+            while True:
+                timeout = heartbeat
+                if expires_at is not None:
+                    remaining = expires_at - time.time()
+                    if remaining <= 0:
+                        return
+                    timeout = min(timeout, remaining)
+
+                frame = await subscription.get(timeout)
+                if frame is None:
+                    return
+                yield frame
+        finally:
+            self.unsubscribe(subscription)
+
+
+event_broker = EventBroker()
@@ -0,0 +1,179 @@
+import asyncio
+import logging
+import time
+from typing import Any, Callable
+
+import httpx
+from auth0_api_python import ApiClient
+from auth0_api_python.utils import get_unverified_header
+
+from project.upstream.clients import AUTH0, upstream_clients
+
+logger = logging.getLogger(__name__)
+
+# Failures of a keyset fetch: unreachable Auth0, an error answer or a body that
+# is not the expected JSON
+FETCH_ERRORS = (httpx.HTTPError, ValueError, KeyError, TypeError)
+
+
+class JWKSCache:
+    """
+    OIDC metadata and JSON Web Key Set of the Auth0 tenant, kept in memory for
+    the token verifier. Fetched at startup, refreshed in the background and
+    when a token is signed with an unknown `kid`.
+    Concurrent refreshes share a single fetch.
+    """
+
+    def __init__(
+        self,
+        domain: str,
+        refresh_interval: float,
+        min_refresh_interval: float,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        """
+        Args:
+            domain: Auth0 domain of the tenant
+            refresh_interval: seconds between background refreshes of the keyset
+            min_refresh_interval: minimum seconds between refreshes triggered
+                by an unknown `kid`, so bogus tokens can't hammer Auth0
+            clock: monotonic clock used to rate limit refreshes
+        """
+        self.metadata_url = f"https://{domain}/.well-known/openid-configuration"
+        self.refresh_interval = refresh_interval
+        self.min_refresh_interval = min_refresh_interval
+        self._clock = clock
+        self._metadata: dict[str, Any] | None = None
+        self._keyset: dict[str, Any] | None = None
+        self._kids: set[str] = set()
+        self._refreshed_at: float | None = None
+        self._inflight: asyncio.Task[dict[str, Any]] | None = None
+        self._refresh_task: asyncio.Task[None] | None = None
+        self._verifier: ApiClient | None = None
+
+    def bind(self, verifier: ApiClient) -> None:
+        """
+        Hand every refreshed keyset to the `ApiClient` of the Auth0 plugin,
+        which otherwise keeps the first keyset it loaded forever
+        """
+        self._verifier = verifier
+
+    async def start(self) -> None:
+        """
+        Prefetch the keyset and schedule the background refresh.
+        A failed prefetch is logged, verification then loads the keys lazily.
+        """
+        try:
+            await self.refresh()
+        except FETCH_ERRORS:
+            logger.warning("Prefetching the Auth0 JWKS failed", exc_info=True)
+        self._refresh_task = asyncio.create_task(self._refresh_loop())
+
+    async def aclose(self) -> None:
+        """
+        Stop the background refresh
+        """
+        task, self._refresh_task = self._refresh_task, None
+        if task is not None:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+    async def fetch(self, url: str) -> dict[str, Any]:
+        """
+        `custom_fetch` hook of the Auth0 plugin, serves its discovery and
+        keyset lookups from the cache
+        """
+        if url == self.metadata_url:
+            return await self._get_metadata()
+        if self._metadata is not None and url == self._metadata["jwks_uri"]:
+            if self._keyset is None:
+                return await self.refresh()
+            return self._keyset
+        return await self._get_json(url)
+
+    def has_key(self, kid: str) -> bool:
+        """
+        Whether the cached keyset contains the key `kid`
+        """
+        return kid in self._kids
+
+    async def ensure_key_for(self, token: str) -> None:
+        """
+        Refresh the keyset when `token` is signed with a key that is not
+        cached yet, e.g. right after Auth0 rotated its signing keys
+        """
+        if self._keyset is None:
+            return
+        try:
+            kid = get_unverified_header(token).get("kid")
+        except ValueError:
+            return
+        if not isinstance(kid, str) or self.has_key(kid):
+            return
+        if (
+            self._refreshed_at is not None
+            and self._clock() - self._refreshed_at < self.min_refresh_interval
+        ):
+            return
+        try:
+            await self.refresh()
+        except FETCH_ERRORS:
+            logger.warning("Refreshing the Auth0 JWKS failed", exc_info=True)
+
+    async def refresh(self) -> dict[str, Any]:
+        """
+        Fetch the current keyset, joining a refresh that is already running
+        """
+        if self._inflight is None:
+            self._inflight = asyncio.create_task(self._fetch_keyset())
+            self._inflight.add_done_callback(self._clear_inflight)
+        return await asyncio.shield(self._inflight)
+
+    def _clear_inflight(self, _: asyncio.Task[dict[str, Any]]) -> None:
+        self._inflight = None
+
+    async def _fetch_keyset(self) -> dict[str, Any]:
+        metadata = await self._get_metadata()
+        keyset = await self._get_json(metadata["jwks_uri"])
+
+        self._keyset = keyset
+        self._kids = {key["kid"] for key in keyset.get("keys", []) if "kid" in key}
+        self._refreshed_at = self._clock()
+        if self._verifier is not None:
+            _hand_keyset(self._verifier, keyset)
+        return keyset
+
+    async def _get_metadata(self) -> dict[str, Any]:
+        if self._metadata is None:
+            metadata = await self._get_json(self.metadata_url)
+            # Only cache metadata the keyset can be found with
+            if not isinstance(metadata.get("jwks_uri"), str):
+                raise KeyError("jwks_uri")
+            self._metadata = metadata
+        return self._metadata
+
+    async def _get_json(self, url: str) -> dict[str, Any]:
+        response = await upstream_clients.get(AUTH0).get(url)
+        response.raise_for_status()
+        data = response.json()
+        if not isinstance(data, dict):
+            raise ValueError(f"Expected a JSON object from {url}")
+        return data
+
+    async def _refresh_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            try:
+                await self.refresh()
+            except FETCH_ERRORS:
+                logger.warning("Refreshing the Auth0 JWKS failed", exc_info=True)
+
+
+def _hand_keyset(verifier: ApiClient, keyset: dict[str, Any]) -> None:
+    """
+    Replace the keyset of the Auth0 `ApiClient`. It loads the keyset once
+    through `custom_fetch` and keeps it in its private `_jwks_data`, without a
+    public way to reload it. This is the only place that touches the SDK
+    internals, recheck it when upgrading auth0-api-python.
+    """
+    verifier._jwks_data = keyset
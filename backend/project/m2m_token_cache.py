@@ -0,0 +1,78 @@
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable
+
+from project.db.models.user import TokenResponse
+
+logger = logging.getLogger(__name__)
+
+
+class M2MTokenCache:
+    """
+    Machine-to-machine access token, reused until shortly before it expires.
+    Inside the refresh margin the current token is still served while a new
+    one is fetched in the background, concurrent refreshes share one fetch.
+    """
+
+    def __init__(
+        self,
+        fetch: Callable[[], Awaitable[TokenResponse]],
+        refresh_margin: float,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        """
+        Args:
+            fetch: requests a new token from the authorization server
+            refresh_margin: seconds before expiry at which the token is renewed
+            clock: monotonic clock used for the expiry of the token
+        """
+        self._fetch = fetch
+        self.refresh_margin = refresh_margin
+        self._clock = clock
+        self._token: TokenResponse | None = None
+        self._expires_at = 0.0
+        self._inflight: asyncio.Task[TokenResponse] | None = None
+
+    async def get(self) -> TokenResponse:
+        """
+        Current token, with `expires_in` set to its remaining lifetime
+        """
+        remaining = self._expires_at - self._clock()
+        if self._token is None or remaining <= 0:
+            await self.refresh()
+        elif remaining <= self.refresh_margin and self._inflight is None:
+            self._start_refresh().add_done_callback(self._log_failed_refresh)
+        return self._current()
+
+    async def refresh(self) -> TokenResponse:
+        """
+        Fetch a new token, joining a refresh that is already running
+        """
+        task = self._inflight or self._start_refresh()
+        await asyncio.shield(task)
+        return self._current()
+
+    def _current(self) -> TokenResponse:
+        assert self._token is not None
+        remaining = max(int(self._expires_at - self._clock()), 0)
+        return self._token.model_copy(update={"expires_in": remaining})
+
+    def _start_refresh(self) -> asyncio.Task[TokenResponse]:
+        self._inflight = asyncio.create_task(self._fetch_token())
+        self._inflight.add_done_callback(self._clear_inflight)
+        return self._inflight
+
+    def _clear_inflight(self, _: asyncio.Task[TokenResponse]) -> None:
+        self._inflight = None
+
+    def _log_failed_refresh(self, task: asyncio.Task[TokenResponse]) -> None:
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning("Refreshing the M2M token failed", exc_info=task.exception())
+
+    async def _fetch_token(self) -> TokenResponse:
+        requested_at = self._clock()
+        token = await self._fetch()
+        self._token = token
+        self._expires_at = requested_at + token.expires_in
+        return token
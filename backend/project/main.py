@@ -1,16 +1,41 @@
 from contextlib import asynccontextmanager
 from typing import Any, AsyncGenerator
 
-import httpx
-from fastapi import FastAPI
+from fastapi import Depends, FastAPI
 
+from project.auth_setup import jwks_cache
+from project.config import get_settings
+from project.events import event_broker
 from project.globals import CLIENT_URL
 from project.middleware.cors import setup_cors_middleware
-from project.routes import auth, encounters, mails, patients
+from project.middleware.metrics import setup_metrics_middleware
+from project.middleware.timing import setup_server_timing_middleware
+from project.middleware.tracing import setup_tracing_middleware
+from project.profiling import profile_request
+from project.routes import (
+    auth,
+    debug,
+    encounters,
+    events,
+    health,
+    mails,
+    metrics,
+    patients,
+)
+from project.tracing import span_exporter
+from project.upstream.cache import (
+    build_cache_backend,
+    get_resource_ttls,
+    response_cache,
+)
+from project.upstream.clients import get_upstream_configs, upstream_clients
 
 
 def add_middleware(app: FastAPI) -> None:
     """apply middleware handlers"""
+    setup_metrics_middleware(app)
+    setup_server_timing_middleware(app)
+    setup_tracing_middleware(app)
     # Provide allowed_origins to the CORS setup. Adjust as needed for your environment.
     if CLIENT_URL is not None:
         setup_cors_middleware(app, allowed_origins=[CLIENT_URL])
@@ -20,7 +45,11 @@ def build_app() -> FastAPI:
     """
     Build and configure the FastAPI app with optional settings override.
     """
-    app = FastAPI(root_path="/api", lifespan=lifespan)
+    app = FastAPI(
+        root_path="/api",
+        lifespan=lifespan,
+        dependencies=[Depends(profile_request)],
+    )
     add_middleware(app)
     return app
 
@@ -30,8 +59,20 @@ async def lifespan(app: FastAPI) -> AsyncGenerator[Any, Any]:
     """
     Context manager that sets up and tears down resources.
     """
-    app.state.http = httpx.AsyncClient()
-    yield
+    upstream_clients.start(get_upstream_configs())
+    app.state.http = upstream_clients
+    response_cache.start(build_cache_backend(), get_resource_ttls())
+    await jwks_cache.start()
+    if get_settings().otlp_endpoint is not None:
+        span_exporter.start(get_settings().tracing_export_interval)
+    try:
+        yield
+    finally:
+        event_broker.close()
+        await span_exporter.aclose()
+        await jwks_cache.aclose()
+        await response_cache.aclose()
+        await upstream_clients.aclose()
 
 
 app: FastAPI = build_app()
@@ -40,6 +81,10 @@ app.include_router(auth.router)
 app.include_router(encounters.router)
 app.include_router(patients.router)
 app.include_router(mails.router)
+app.include_router(events.router)
+app.include_router(health.router)
+app.include_router(metrics.router)
+app.include_router(debug.router)
 
 
 @app.get("/", tags=["root"])
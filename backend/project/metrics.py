@@ -0,0 +1,298 @@
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from typing import Iterator, TypeVar
+
+# Upper bounds in seconds of the latency histograms
+LATENCY_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: tuple[str, ...], values: tuple[str, ...]) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(
+        f'{name}="{_escape(str(value))}"'
+        for name, value in zip(names, values, strict=True)
+    )
+    return "{" + pairs + "}"
+
+
+class Metric(ABC):
+    """
+    Metric with a fixed set of label names, rendered in the Prometheus text
+    format. Series are created on their first use.
+    """
+
+    kind = "untyped"
+
+    def __init__(
+        self, name: str, documentation: str, labels: tuple[str, ...] = ()
+    ) -> None:
+        """
+        Args:
+            name: metric name
+            documentation: HELP text of the metric
+            labels: names of the labels, their values are passed positionally
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+
+    def render(self) -> Iterator[str]:
+        """
+        Lines of the metric in the text exposition format
+        """
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} {self.kind}"
+        yield from self._samples()
+
+    @abstractmethod
+    def _samples(self) -> Iterator[str]:
+        """
+        Sample lines of every series of the metric
+        """
+
+
+class _ValueMetric(Metric):
+    def __init__(
+        self, name: str, documentation: str, labels: tuple[str, ...] = ()
+    ) -> None:
+        super().__init__(name, documentation, labels)
+        self._values: dict[tuple[str, ...], float] = {}
+
+    def set(self, value: float, *labels: str) -> None:
+        """
+        Set the series of `labels` to `value`
+        """
+        self._values[labels] = value
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        """
+        Add `amount` to the series of `labels`
+        """
+        self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def _samples(self) -> Iterator[str]:
+        for labels, value in self._values.items():
+            yield f"{self.name}{_format_labels(self.labels, labels)} {value}"
+
+
+class Counter(_ValueMetric):
+    """
+    Monotonically increasing value per label set. `set` mirrors a total
+    that is counted elsewhere, at scrape time.
+    """
+
+    kind = "counter"
+
+
+class Gauge(_ValueMetric):
+    """
+    Value per label set that can go up and down
+    """
+
+    kind = "gauge"
+
+
+class Histogram(Metric):
+    """
+    Distribution of observed values per label set.
+    Observing is a bisect and two additions, the cumulative bucket counts are
+    only computed when rendering.
+    """
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labels: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = LATENCY_BUCKETS,
+    ) -> None:
+        """
+        Args:
+            name: metric name
+            documentation: HELP text of the metric
+            labels: names of the labels, their values are passed positionally
+            buckets: sorted upper bounds of the buckets, +Inf is added
+        """
+        super().__init__(name, documentation, labels)
+        self.buckets = buckets
+        # Per label set: count per bucket (the last one is +Inf) and the sum
+        self._series: dict[tuple[str, ...], tuple[list[int], list[float]]] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        """
+        Record `value` in the series of `labels`
+        """
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = ([0] * (len(self.buckets) + 1), [0.0])
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1][0] += value
+
+    def _samples(self) -> Iterator[str]:
+        names = (*self.labels, "le")
+        for labels, (counts, total) in self._series.items():
+            cumulative = 0
+            for bound, count in zip((*self.buckets, "+Inf"), counts, strict=True):
+                cumulative += count
+                bucket_labels = _format_labels(names, (*labels, str(bound)))
+                yield f"{self.name}_bucket{bucket_labels} {cumulative}"
+            label_text = _format_labels(self.labels, labels)
+            yield f"{self.name}_sum{label_text} {total[0]}"
+            yield f"{self.name}_count{label_text} {cumulative}"
+
+
+MetricT = TypeVar("MetricT", bound=Metric)
+
+
+class Registry:
+    """
+    Metrics exposed on /metrics
+    """
+
+    def __init__(self) -> None:
+        """
+        Create an empty registry
+        """
+        self._metrics: dict[str, Metric] = {}
+
+    def register(self, metric: MetricT) -> MetricT:
+        """
+        Add a metric, its name must be unique
+        """
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric '{metric.name}' is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        """
+        All metrics in the Prometheus text exposition format
+        """
+        lines = [line for metric in self._metrics.values() for line in metric.render()]
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+http_requests = registry.register(
+    Counter(
+        "http_requests_total",
+        "Requests handled by the gateway",
+        ("method", "route", "status"),
+    )
+)
+http_request_duration = registry.register(
+    Histogram(
+        "http_request_duration_seconds",
+        "Time to handle a request, until its last body chunk",
+        ("method", "route"),
+    )
+)
+http_requests_in_flight = registry.register(
+    Gauge("http_requests_in_flight", "Requests the gateway is handling now")
+)
+upstream_request_duration = registry.register(
+    Histogram(
+        "upstream_request_duration_seconds",
+        "Time of one upstream attempt, until its headers for streamed bodies",
+        ("upstream", "operation", "status"),
+    )
+)
+upstream_decode_duration = registry.register(
+    Histogram(
+        "upstream_decode_duration_seconds",
+        "Time to validate an upstream body into its response model",
+        ("model",),
+    )
+)
+response_cache_requests = registry.register(
+    Counter(
+        "response_cache_requests_total",
+        "Lookups in the response cache of upstream GETs",
+        ("resource", "result"),
+    )
+)
+auth_verification_duration = registry.register(
+    Histogram(
+        "auth_verification_duration_seconds",
+        "Time to verify a bearer token that was not cached",
+    )
+)
+
+# Collected when /metrics is scraped
+upstream_pool_connections = registry.register(
+    Gauge(
+        "upstream_pool_connections",
+        "Pooled connections per upstream",
+        ("upstream", "state"),
+    )
+)
+upstream_pool_max_connections = registry.register(
+    Gauge(
+        "upstream_pool_max_connections",
+        "Connection limit of the pool per upstream",
+        ("upstream",),
+    )
+)
+upstream_pool_queued = registry.register(
+    Gauge(
+        "upstream_pool_queued_requests",
+        "Requests waiting for a pooled connection per upstream",
+        ("upstream",),
+    )
+)
+upstream_concurrency = registry.register(
+    Gauge(
+        "upstream_concurrency",
+        "Adaptive concurrency limiter per upstream",
+        ("upstream", "value"),
+    )
+)
+upstream_shed = registry.register(
+    Counter(
+        "upstream_shed_total",
+        "Calls rejected by the concurrency limiter per upstream",
+        ("upstream",),
+    )
+)
+upstream_breaker_open = registry.register(
+    Gauge(
+        "upstream_breaker_open",
+        "1 while the circuit breaker of an upstream is open or half open",
+        ("upstream",),
+    )
+)
+cache_entries = registry.register(
+    Gauge("cache_entries", "Entries in an in-process cache", ("cache",))
+)
+cache_lookups = registry.register(
+    Counter(
+        "cache_lookups_total",
+        "Lookups in an in-process cache",
+        ("cache", "result"),
+    )
+)
+event_subscribers = registry.register(
+    Gauge("event_subscribers", "Clients connected to /events")
+)
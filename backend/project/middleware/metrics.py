@@ -0,0 +1,65 @@
+import time
+
+from fastapi import FastAPI
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from project.metrics import (
+    http_request_duration,
+    http_requests,
+    http_requests_in_flight,
+)
+
+
+class MetricsMiddleware:
+    """
+    Counts and times every HTTP request by method, route template and status.
+    Plain ASGI instead of `BaseHTTPMiddleware`, so responses are not buffered
+    and the hot path stays a few clock reads and dict updates.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        """
+        Args:
+            app: the wrapped ASGI application
+        """
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        """
+        Handle a request and record its metrics, other scopes pass through
+        """
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        http_requests_in_flight.inc()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            http_requests_in_flight.inc(amount=-1)
+            # The route template keeps ids out of the labels
+            route = scope.get("route")
+            template = getattr(route, "path", "unmatched")
+            http_request_duration.observe(
+                time.perf_counter() - started, scope["method"], template
+            )
+            http_requests.inc(scope["method"], template, str(status_code))
+
+
+def setup_metrics_middleware(app: FastAPI) -> None:
+    """
+    add the metrics middleware to the application
+
+    Args:
+        app: FastAPI application instance
+    """
+    app.add_middleware(MetricsMiddleware)
@@ -0,0 +1,53 @@
+from fastapi import FastAPI
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from project.timing import ServerTiming, current_timing
+
+
+class ServerTimingMiddleware:
+    """
+    Adds a `Server-Timing` header with the phases recorded while handling the
+    request: token verification, every upstream call, validation and
+    serialization
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        """
+        Args:
+            app: the wrapped ASGI application
+        """
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        """
+        Handle a request and add its timings to the response headers, other
+        scopes pass through
+        """
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timing = ServerTiming()
+
+        async def send_with_timing(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                headers.append("Server-Timing", timing.header())
+            await send(message)
+
+        token = current_timing.set(timing)
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            current_timing.reset(token)
+
+
+def setup_server_timing_middleware(app: FastAPI) -> None:
+    """
+    add the Server-Timing middleware to the application
+
+    Args:
+        app: FastAPI application instance
+    """
+    app.add_middleware(ServerTimingMiddleware)
@@ -0,0 +1,66 @@
+from fastapi import FastAPI
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from project.tracing import current_span, end_span, start_server_span
+
+
+class TracingMiddleware:
+    """
+    Opens the server span of every HTTP request, continuing the trace of a
+    W3C `traceparent` header. Upstream calls made while handling the request
+    become its children and pass the trace on.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        """
+        Args:
+            app: the wrapped ASGI application
+        """
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        """
+        Handle a request inside its server span, other scopes pass through
+        """
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        span = start_server_span(
+            f"{scope['method']} {scope['path']}",
+            Headers(scope=scope).get("traceparent"),
+        )
+        span.attributes["http.request.method"] = scope["method"]
+        span.attributes["url.path"] = scope["path"]
+
+        async def send_with_status(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                span.attributes["http.response.status_code"] = message["status"]
+                span.error = message["status"] >= 500
+            await send(message)
+
+        token = current_span.set(span)
+        try:
+            await self.app(scope, receive, send_with_status)
+        except BaseException:
+            span.error = True
+            raise
+        finally:
+            current_span.reset(token)
+            # Named after the route template once routing is done
+            route = getattr(scope.get("route"), "path", None)
+            if route is not None:
+                span.name = f"{scope['method']} {route}"
+                span.attributes["http.route"] = route
+            end_span(span)
+
+
+def setup_tracing_middleware(app: FastAPI) -> None:
+    """
+    add the tracing middleware to the application
+
+    Args:
+        app: FastAPI application instance
+    """
+    app.add_middleware(TracingMiddleware)
@@ -0,0 +1,126 @@
+import asyncio
+import base64
+from datetime import datetime
+from typing import AsyncIterator, Awaitable, Callable, Protocol, TypeVar
+
+from fastapi import HTTPException, status
+from pydantic import BaseModel, Field, ValidationError
+
+from project.db.models.basemodel import PaginationResponse
+
+PageT = TypeVar("PageT")
+ItemT = TypeVar("ItemT")
+CursorT = TypeVar("CursorT", bound=BaseModel)
+
+
+class KeysetItem(Protocol):
+    @property
+    def createdAt(self) -> datetime:
+        """
+        Creation time, the first sort key
+        """
+
+    @property
+    def id(self) -> str:
+        """
+        Unique id, breaks ties between items created at the same time
+        """
+
+
+KeysetItemT = TypeVar("KeysetItemT", bound=KeysetItem)
+
+
+class PageCursor(BaseModel):
+    page: int = Field(ge=1)
+    limit: int = Field(ge=1)
+
+
+class KeysetCursor(BaseModel):
+    """
+    Position after the last item of a page sorted newest first
+    """
+
+    createdAt: datetime
+    id: str
+
+
+def encode_cursor(cursor: BaseModel) -> str:
+    """
+    Opaque cursor string of a position
+    """
+    return base64.urlsafe_b64encode(cursor.model_dump_json().encode()).decode()
+
+
+def decode_cursor(value: str, cursor_model: type[CursorT]) -> CursorT:
+    """
+    Position of an opaque cursor string
+
+    Raises:
+        HTTPException: 400 when the cursor is not one of ours
+    """
+    try:
+        return cursor_model.model_validate_json(base64.urlsafe_b64decode(value))
+    # binascii.Error and non-ASCII input of b64decode are both ValueError
+    except (ValueError, ValidationError) as exc:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor"
+        ) from exc
+
+
+def next_cursor(pagination: PaginationResponse) -> str | None:
+    """
+    Cursor of the page after `pagination`, None on the last page
+    """
+    if pagination.page >= pagination.totalPages:
+        return None
+    return encode_cursor(PageCursor(page=pagination.page + 1, limit=pagination.limit))
+
+
+def keyset_page(
+    items: list[KeysetItemT], limit: int | None, after: KeysetCursor | None
+) -> tuple[list[KeysetItemT], str | None]:
+    """
+    Page of `items`, newest first, that starts after the cursor position
+
+    Returns:
+        the page and the cursor of the next page, None on the last page
+    """
+    ordered = sorted(items, key=lambda item: (item.createdAt, item.id), reverse=True)
+    if after is not None:
+        position = (after.createdAt, after.id)
+        ordered = [item for item in ordered if (item.createdAt, item.id) < position]
+
+    if limit is None or len(ordered) <= limit:
+        return ordered, None
+    page = ordered[:limit]
+    last = page[-1]
+    return page, encode_cursor(KeysetCursor(createdAt=last.createdAt, id=last.id))
+
+
+async def iterate_pages(
+    fetch_page: Callable[[int], Awaitable[PageT]],
+    get_items: Callable[[PageT], list[ItemT]],
+    get_pagination: Callable[[PageT], PaginationResponse],
+) -> AsyncIterator[ItemT]:
+    """
+    Walk all pages lazily, yielding their items.
+    The next page is requested while the items of the current one are consumed.
+    """
+    page = await fetch_page(1)
+    while True:
+        pagination = get_pagination(page)
+        upcoming = None
+        if pagination.page < pagination.totalPages:
+            upcoming = asyncio.ensure_future(fetch_page(pagination.page + 1))
+
+        try:
+            for item in get_items(page):
+                yield item
+        except BaseException:
+            if upcoming is not None:
+                upcoming.cancel()
+            raise
+
+        if upcoming is None:
+            return
+        page = await upcoming
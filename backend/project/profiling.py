@@ -0,0 +1,105 @@
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from typing import AsyncIterator
+
+from fastapi import HTTPException, Request, status
+
+from project.config import get_settings
+from project.services.auth_service import get_claims, has_scope
+from project.timing import record_timing
+from project.ttl_cache import TTLCache
+
+# Scope a token needs to profile its requests
+PROFILE_SCOPE = "debug:profile"
+PROFILE_HEADER = "x-profile"
+
+
+class SamplingProfiler:
+    """
+    Samples the call stack of one thread at a fixed interval from a
+    background thread. The result is in the collapsed stack format
+    ("outer;inner count" per line) read by flame graph tools.
+
+    All coroutines run on the thread of the event loop, so a profile also
+    contains the samples of other requests that ran at the same time.
+    """
+
+    def __init__(self, thread_id: int, interval: float) -> None:
+        """
+        Args:
+            thread_id: id of the thread to sample, e.g. `threading.get_ident()`
+            interval: seconds between two samples
+        """
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks: Counter[str] = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name="request-profiler", daemon=True
+        )
+
+    def start(self) -> None:
+        """
+        Start sampling
+        """
+        self._thread.start()
+
+    def stop(self) -> str:
+        """
+        Stop sampling and return the collapsed stacks
+        """
+        self._stop.set()
+        self._thread.join()
+        return "".join(
+            f"{stack} {count}\n" for stack, count in self.stacks.most_common()
+        )
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            names = []
+            while frame is not None:
+                code = frame.f_code
+                location = f"{code.co_filename}:{code.co_firstlineno}"
+                names.append(f"{code.co_qualname} ({location})")
+                frame = frame.f_back
+            if names:
+                self.stacks[";".join(reversed(names))] += 1
+
+
+# Finished profiles by id, kept for offline analysis
+profiles: TTLCache[str] = TTLCache(max_size=get_settings().profile_max_stored)
+
+
+async def profile_request(request: Request) -> AsyncIterator[None]:
+    """
+    App wide dependency that profiles a request sent with `X-Profile: 1` by a
+    token with the `debug:profile` scope. The profile covers the endpoint and
+    the serialization of its result, its id is sent back in the
+    `Server-Timing` header as `profile;desc="<id>"` and it can be fetched from
+    `/debug/profiles/<id>`.
+    """
+    if request.headers.get(PROFILE_HEADER) != "1":
+        yield
+        return
+
+    # Only profiled requests need a token, so the claims are not a declared
+    # dependency of this app wide dependency
+    if not has_scope(await get_claims(request), PROFILE_SCOPE):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Forbidden")
+
+    settings = get_settings()
+    profiler = SamplingProfiler(
+        threading.get_ident(), interval=settings.profile_sample_interval
+    )
+    profile_id = uuid.uuid4().hex
+    started = time.perf_counter()
+    profiler.start()
+    try:
+        yield
+    finally:
+        profiles.set(profile_id, profiler.stop(), ttl=settings.profile_ttl)
+        record_timing("profile", time.perf_counter() - started, profile_id)
@@ -0,0 +1,95 @@
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Callable
+
+from fastapi import HTTPException, status
+from pydantic import BaseModel, create_model
+
+
+@dataclass(frozen=True)
+class FieldSelection:
+    """
+    Sparse fieldset of a response: `include` picks the nested relations and
+    `fields` the other fields, None keeps all of them
+    """
+
+    include: frozenset[str] | None = None
+    fields: frozenset[str] | None = None
+
+    @property
+    def is_full(self) -> bool:
+        """
+        Whether nothing is left out
+        """
+        return self.include is None and self.fields is None
+
+    def params(self) -> dict[str, str | None]:
+        """
+        Query params that forward the selection to the upstream
+        """
+        return {"include": _join(self.include), "fields": _join(self.fields)}
+
+
+def _join(names: frozenset[str] | None) -> str | None:
+    return None if names is None else ",".join(sorted(names))
+
+
+def _split(value: str | None) -> frozenset[str] | None:
+    if value is None:
+        return None
+    return frozenset(name.strip() for name in value.split(",") if name.strip())
+
+
+@lru_cache
+def projected_model(
+    model: type[BaseModel], relations: frozenset[str], selection: FieldSelection
+) -> type[BaseModel]:
+    """
+    Copy of `model` with only the selected fields, so the left out relations
+    are neither validated nor serialized. The id is always kept.
+    """
+    if selection.is_full:
+        return model
+
+    names = set(model.model_fields)
+    keep = {"id"}
+    keep |= relations if selection.include is None else selection.include
+    keep |= names - relations if selection.fields is None else selection.fields
+
+    fields: dict[str, Any] = {
+        name: (info.annotation, info)
+        for name, info in model.model_fields.items()
+        if name in keep
+    }
+    return create_model(  # type: ignore[call-overload]
+        f"{model.__name__}Projection",
+        __config__=model.model_config,
+        **fields,
+    )
+
+
+def select_fields(
+    model: type[BaseModel], relations: frozenset[str]
+) -> Callable[[str | None, str | None], FieldSelection]:
+    """
+    Dependency reading the `include` and `fields` query params of a route
+    that returns `model`
+    """
+    names = set(model.model_fields)
+
+    def dep(include: str | None = None, fields: str | None = None) -> FieldSelection:
+        selection = FieldSelection(include=_split(include), fields=_split(fields))
+
+        unknown = set()
+        if selection.include is not None:
+            unknown |= selection.include - relations
+        if selection.fields is not None:
+            unknown |= selection.fields - (names - relations)
+        if unknown:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Unknown fields: {', '.join(sorted(unknown))}",
+            )
+        return selection
+
+    return dep
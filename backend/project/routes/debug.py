@@ -0,0 +1,28 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import PlainTextResponse
+
+from project.profiling import PROFILE_SCOPE, profiles
+from project.services.auth_service import check_scope
+
+router = APIRouter(
+    prefix="/debug",
+    responses={404: {"description": "Profile not found"}},
+    tags=["Debug"],
+)
+
+
+@router.get(
+    "/profiles/{profile_id}",
+    response_class=PlainTextResponse,
+    status_code=status.HTTP_200_OK,
+    dependencies=[Depends(check_scope(PROFILE_SCOPE))],
+)
+async def get_profile(profile_id: str) -> PlainTextResponse:
+    """
+    Sampled profile of a request in the collapsed stack format, e.g. for
+    flamegraph.pl or speedscope
+    """
+    profile = profiles.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
+    return PlainTextResponse(profile)
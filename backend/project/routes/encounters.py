@@ -1,21 +1,41 @@
 from typing import Annotated
 
-from fastapi import APIRouter, Depends, status
+from fastapi import APIRouter, Depends, Request, Response, status
+from fastapi.responses import StreamingResponse
 
-from project.db.models.details import EncounterDetailResponse
+from project.bulk import bulk_items
+from project.conditional import NOT_MODIFIED_RESPONSE, conditional_response
+from project.db.models.batch import (
+    BatchLookupRequest,
+    BulkResponse,
+    EncounterBatchResponse,
+)
+from project.db.models.details import ENCOUNTER_RELATIONS, EncounterDetailResponse
 from project.db.models.encounter import (
     EncounterResponse,
     PaginatedEncounterResponse,
 )
-from project.db.models.enums import EncounterStatusEnum, EncounterTypeEnum
+from project.db.models.enums import (
+    EncounterStatusEnum,
+    EncounterTypeEnum,
+    RequestPriorityEnum,
+)
+from project.pagination import PageCursor, decode_cursor
+from project.projection import FieldSelection, select_fields
 from project.services.auth_service import check_scope, get_bearer_token
 from project.services.encounter_service import (
     create_encounter_service,
+    create_encounters_bulk_service,
     delete_encounter_service,
     get_encounter_by_id_service,
+    get_encounter_selection_service,
+    get_encounters_by_ids_service,
     get_encounters_service,
+    stream_encounters_service,
     update_encounter_service,
+    update_encounters_bulk_service,
 )
+from project.upstream.limiter import set_request_priority, with_priority
 
 router = APIRouter(
     prefix="/encounters",
@@ -37,7 +57,26 @@ async def get_encounters(
     encounter_id: int | None = None,
     encounter_status: EncounterStatusEnum | None = None,
     encounter_type: EncounterTypeEnum | None = None,
-) -> PaginatedEncounterResponse:
+    stream: bool = False,
+    cursor: str | None = None,
+) -> PaginatedEncounterResponse | StreamingResponse:
+    if cursor is not None:
+        position = decode_cursor(cursor, PageCursor)
+        page, limit = position.page, position.limit
+
+    if stream:
+        # Exports are shed before interactive calls under load
+        set_request_priority(RequestPriorityEnum.LOW)
+        chunks = await stream_encounters_service(
+            token=token,
+            page=page,
+            limit=limit,
+            encounter_id=encounter_id,
+            encounter_status=encounter_status,
+            encounter_type=encounter_type,
+        )
+        return StreamingResponse(chunks, media_type="application/json")
+
     encounter_result = await get_encounters_service(
         token=token,
         page=page,
@@ -53,15 +92,45 @@ async def get_encounters(
     "/{encounter_id}",
     response_model=EncounterDetailResponse,
     status_code=status.HTTP_200_OK,
+    responses=NOT_MODIFIED_RESPONSE,
     dependencies=[Depends(check_scope("encounters:get"))],
 )
 async def get_encounter(
-    encounter_id: int, token: str = Depends(get_bearer_token)
-) -> EncounterDetailResponse:
-    encounter = await get_encounter_by_id_service(
-        encounter_id=encounter_id, token=token
+    encounter_id: int,
+    request: Request,
+    selection: Annotated[
+        FieldSelection,
+        Depends(select_fields(EncounterDetailResponse, ENCOUNTER_RELATIONS)),
+    ],
+    token: str = Depends(get_bearer_token),
+) -> Response:
+    if selection.is_full:
+        encounter = await get_encounter_by_id_service(
+            encounter_id=encounter_id, token=token
+        )
+    else:
+        encounter = await get_encounter_selection_service(
+            encounter_id=encounter_id, token=token, selection=selection
+        )
+    return conditional_response(request, encounter)
+
+
+@router.post(
+    "/batch",
+    response_model=EncounterBatchResponse,
+    status_code=status.HTTP_200_OK,
+    dependencies=[Depends(check_scope("encounters:get"))],
+)
+async def get_encounters_batch(
+    batch: BatchLookupRequest, token: str = Depends(get_bearer_token)
+) -> EncounterBatchResponse:
+    """
+    Encounters of a list of ids, keyed by id. Ids that failed are in `errors`.
+    """
+    encounters = await get_encounters_by_ids_service(
+        encounter_ids=batch.ids, token=token
     )
-    return encounter
+    return encounters
 
 
 @router.post(
@@ -78,6 +147,47 @@ async def create_encounter(
     return encounter
 
 
+@router.post(
+    "/bulk",
+    response_model=BulkResponse,
+    status_code=status.HTTP_200_OK,
+    dependencies=[
+        Depends(check_scope("encounters:create")),
+        Depends(with_priority(RequestPriorityEnum.LOW)),
+    ],
+)
+async def create_encounters_bulk(
+    items: Annotated[list[EncounterResponse], Depends(bulk_items(EncounterResponse))],
+    token: str = Depends(get_bearer_token),
+) -> BulkResponse:
+    """
+    Create encounters from a JSON array or NDJSON body, with a status per item
+    """
+    result = await create_encounters_bulk_service(items=items, token=token)
+    return result
+
+
+@router.put(
+    "/bulk",
+    response_model=BulkResponse,
+    status_code=status.HTTP_200_OK,
+    dependencies=[
+        Depends(check_scope("encounters:update")),
+        Depends(with_priority(RequestPriorityEnum.LOW)),
+    ],
+)
+async def update_encounters_bulk(
+    items: Annotated[list[EncounterResponse], Depends(bulk_items(EncounterResponse))],
+    token: str = Depends(get_bearer_token),
+) -> BulkResponse:
+    """
+    Update encounters by id from a JSON array or NDJSON body, with a status
+    per item
+    """
+    result = await update_encounters_bulk_service(items=items, token=token)
+    return result
+
+
 @router.put(
     "/{encounter_id}",
     response_model=EncounterDetailResponse,
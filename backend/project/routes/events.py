@@ -0,0 +1,82 @@
+from typing import Annotated
+
+from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import StreamingResponse
+
+from project.config import get_settings
+from project.db.models.enums import EventTopicEnum
+from project.events import event_broker
+from project.services.auth_service import get_claims, has_scope
+
+router = APIRouter(
+    prefix="/events",
+    tags=["Events"],
+)
+
+# Scope needed to receive the events of a topic
+TOPIC_SCOPES = {
+    EventTopicEnum.MAILS: "mails:get",
+    EventTopicEnum.PATIENTS: "patients:get",
+    EventTopicEnum.ENCOUNTERS: "encounters:get",
+}
+
+# Scope to receive the mail events of every user instead of only one's own
+MAILS_ADMIN_SCOPE = "mails:admin"
+
+
+@router.get(
+    "/",
+    response_class=StreamingResponse,
+    status_code=status.HTTP_200_OK,
+    responses={200: {"content": {"text/event-stream": {}}}},
+)
+async def get_events(
+    claims: Annotated[dict, Depends(get_claims)],
+    topics: str | None = None,
+) -> StreamingResponse:
+    """
+    Server-Sent Events stream of the changes made through the gateway.
+    `topics` is a comma separated list, by default every topic the token has
+    the scope for. Clients refetch the changed resource on an event.
+    Mail events are only sent for the mail user of the token, unless it has
+    the `mails:admin` scope.
+    """
+    allowed = {
+        topic for topic, scope in TOPIC_SCOPES.items() if has_scope(claims, scope)
+    }
+
+    if topics is None:
+        selected = allowed
+    else:
+        try:
+            selected = {EventTopicEnum(name.strip()) for name in topics.split(",")}
+        except ValueError as exc:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST, detail="Unknown topic"
+            ) from exc
+    if not selected or not selected <= allowed:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Forbidden")
+
+    settings = get_settings()
+    user_id = None
+    if EventTopicEnum.MAILS in selected and not has_scope(claims, MAILS_ADMIN_SCOPE):
+        user_id = claims.get(settings.events_mail_user_claim)
+        if user_id is None:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN, detail="Forbidden"
+            )
+        user_id = str(user_id)
+
+    expires_at = claims.get("exp")
+    frames = event_broker.stream(
+        selected,
+        max_size=settings.events_queue_size,
+        heartbeat=settings.events_heartbeat_interval,
+        expires_at=expires_at if isinstance(expires_at, int | float) else None,
+        user_id=user_id,
+    )
+    return StreamingResponse(
+        frames,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
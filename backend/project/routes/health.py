@@ -0,0 +1,17 @@
+from fastapi import APIRouter, status
+
+from project.db.models.health import HealthResponse
+from project.services.health_service import get_health_service
+
+router = APIRouter(
+    prefix="/health",
+    tags=["Health"],
+)
+
+
+@router.get("/", response_model=HealthResponse, status_code=status.HTTP_200_OK)
+async def get_health() -> HealthResponse:
+    """
+    State of the protection of every upstream service, for monitoring
+    """
+    return get_health_service()
@@ -1,15 +1,19 @@
+from datetime import datetime
 from typing import Annotated
 
-from fastapi import APIRouter, Depends, status
+from fastapi import APIRouter, Depends, Query, status
 
+from project.db.models.enums import MailViewEnum
 from project.db.models.mail import (
     CreateMailResponse,
     GetMailByIdResponse,
+    GetMailHeadersByUserResponse,
     GetMailsByUserResponse,
     MailCountResponse,
     MailCreate,
     MarkMailReadResponse,
 )
+from project.pagination import KeysetCursor, decode_cursor
 from project.services.auth_service import check_scope, get_bearer_token
 from project.services.mail_service import (
     create_mail,
@@ -17,6 +21,7 @@ from project.services.mail_service import (
     get_mail_by_id,
     get_mail_by_user,
     get_mail_count,
+    get_mail_headers_by_user,
     mark_mail_as_read,
 )
 
@@ -29,14 +34,28 @@ router = APIRouter(
 
 @router.get(
     "/user/{user_id}",
-    response_model=GetMailsByUserResponse,
+    response_model=GetMailsByUserResponse | GetMailHeadersByUserResponse,
     status_code=status.HTTP_200_OK,
     dependencies=[Depends(check_scope("mails:get"))],
 )
 async def get_mails_by_user(
-    user_id: int, token: str = Depends(get_bearer_token)
-) -> GetMailsByUserResponse:
-    mails = await get_mail_by_user(token=token, user_id=user_id)
+    user_id: int,
+    token: str = Depends(get_bearer_token),
+    limit: int | None = Query(None, ge=1),
+    cursor: str | None = None,
+    since: datetime | None = None,
+    view: MailViewEnum = MailViewEnum.FULL,
+) -> GetMailsByUserResponse | GetMailHeadersByUserResponse:
+    position = None if cursor is None else decode_cursor(cursor, KeysetCursor)
+
+    if view == MailViewEnum.HEADERS:
+        return await get_mail_headers_by_user(
+            token=token, user_id=user_id, limit=limit, cursor=position, since=since
+        )
+
+    mails = await get_mail_by_user(
+        token=token, user_id=user_id, limit=limit, cursor=position, since=since
+    )
     return mails
 
 
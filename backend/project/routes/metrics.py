@@ -0,0 +1,19 @@
+from fastapi import APIRouter, status
+from fastapi.responses import PlainTextResponse
+
+from project.services.metrics_service import get_metrics_service
+
+router = APIRouter(
+    prefix="/metrics",
+    tags=["Metrics"],
+)
+
+
+@router.get("/", response_class=PlainTextResponse, status_code=status.HTTP_200_OK)
+async def get_metrics() -> PlainTextResponse:
+    """
+    Request, upstream, pool and cache metrics for Prometheus
+    """
+    return PlainTextResponse(
+        get_metrics_service(), media_type="text/plain; version=0.0.4"
+    )
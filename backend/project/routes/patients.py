@@ -1,19 +1,50 @@
 from typing import Annotated
 
-from fastapi import APIRouter, Depends, status
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from fastapi.responses import StreamingResponse
 
-from project.db.models.details import PatientDetailResponse
-from project.db.models.enums import PatientStatusEnum
-from project.db.models.patient import PaginatedPatientResponse
+from project.bulk import bulk_items
+from project.conditional import NOT_MODIFIED_RESPONSE, conditional_response
+from project.db.models.batch import (
+    BatchLookupRequest,
+    BulkResponse,
+    PatientBatchResponse,
+)
+from project.db.models.chart import PatientChartResponse
+from project.db.models.details import PATIENT_RELATIONS, PatientDetailResponse
+from project.db.models.enums import (
+    PatientListViewEnum,
+    PatientStatusEnum,
+    RequestPriorityEnum,
+)
+from project.db.models.patient import (
+    PaginatedPatientResponse,
+    PaginatedPatientSummaryResponse,
+)
 from project.db.models.patient_base import PatientResponse
-from project.services.auth_service import check_scope, get_bearer_token
+from project.pagination import PageCursor, decode_cursor
+from project.projection import FieldSelection, select_fields
+from project.services.auth_service import (
+    check_scope,
+    get_bearer_token,
+    get_claims,
+    has_scope,
+)
+from project.services.chart_service import get_patient_chart_service
 from project.services.patients_service import (
     create_patient_service,
+    create_patients_bulk_service,
     delete_patient_service,
     get_patient_by_id_service,
+    get_patient_selection_service,
+    get_patient_summaries_service,
+    get_patients_by_ids_service,
     get_patients_service,
+    stream_patients_service,
     update_patient_service,
+    update_patients_bulk_service,
 )
+from project.upstream.limiter import set_request_priority, with_priority
 
 router = APIRouter(
     prefix="/patient",
@@ -24,18 +55,50 @@ router = APIRouter(
 
 @router.get(
     "/",
-    response_model=PaginatedPatientResponse,
+    response_model=PaginatedPatientResponse | PaginatedPatientSummaryResponse,
     status_code=status.HTTP_200_OK,
     dependencies=[Depends(check_scope("patients:get"))],
 )
 async def get_patients(
     token: str = Depends(get_bearer_token),
+    page: int | None = None,
     limit: int | None = None,
     offset: int | None = None,
     patient_status: PatientStatusEnum | None = None,
     search: str | None = None,
-) -> PaginatedPatientResponse:
+    view: PatientListViewEnum = PatientListViewEnum.FULL,
+    stream: bool = False,
+    cursor: str | None = None,
+) -> PaginatedPatientResponse | PaginatedPatientSummaryResponse | StreamingResponse:
+    if cursor is not None:
+        position = decode_cursor(cursor, PageCursor)
+        page, limit = position.page, position.limit
+
+    if stream:
+        # Exports are shed before interactive calls under load
+        set_request_priority(RequestPriorityEnum.LOW)
+        chunks = await stream_patients_service(
+            page=page,
+            limit=limit,
+            offset=offset,
+            patient_status=patient_status,
+            search=search,
+            token=token,
+        )
+        return StreamingResponse(chunks, media_type="application/json")
+
+    if view == PatientListViewEnum.SUMMARY:
+        return await get_patient_summaries_service(
+            page=page,
+            limit=limit,
+            offset=offset,
+            patient_status=patient_status,
+            search=search,
+            token=token,
+        )
+
     patient_result = await get_patients_service(
+        page=page,
         limit=limit,
         offset=offset,
         patient_status=patient_status,
@@ -49,13 +112,69 @@ async def get_patients(
     "/{patient_id}",
     response_model=PatientDetailResponse,
     status_code=status.HTTP_200_OK,
+    responses=NOT_MODIFIED_RESPONSE,
     dependencies=[Depends(check_scope("patients:get"))],
 )
 async def get_patient(
-    patient_id: int, token: str = Depends(get_bearer_token)
-) -> PatientDetailResponse:
-    patient = await get_patient_by_id_service(patient_id=patient_id, token=token)
-    return patient
+    patient_id: int,
+    request: Request,
+    selection: Annotated[
+        FieldSelection, Depends(select_fields(PatientDetailResponse, PATIENT_RELATIONS))
+    ],
+    token: str = Depends(get_bearer_token),
+) -> Response:
+    if selection.is_full:
+        patient = await get_patient_by_id_service(patient_id=patient_id, token=token)
+    else:
+        patient = await get_patient_selection_service(
+            patient_id=patient_id, token=token, selection=selection
+        )
+    return conditional_response(request, patient)
+
+
+@router.post(
+    "/batch",
+    response_model=PatientBatchResponse,
+    status_code=status.HTTP_200_OK,
+    dependencies=[Depends(check_scope("patients:get"))],
+)
+async def get_patients_batch(
+    batch: BatchLookupRequest, token: str = Depends(get_bearer_token)
+) -> PatientBatchResponse:
+    """
+    Patients of a list of ids, keyed by id. Ids that failed are in `errors`.
+    """
+    patients = await get_patients_by_ids_service(patient_ids=batch.ids, token=token)
+    return patients
+
+
+@router.get(
+    "/{patient_id}/chart",
+    response_model=PatientChartResponse,
+    status_code=status.HTTP_200_OK,
+    dependencies=[
+        Depends(check_scope("patients:get")),
+        Depends(check_scope("encounters:get")),
+        Depends(with_priority(RequestPriorityEnum.HIGH)),
+    ],
+)
+async def get_patient_chart(
+    patient_id: int,
+    claims: Annotated[dict, Depends(get_claims)],
+    user_id: int | None = None,
+    token: str = Depends(get_bearer_token),
+) -> PatientChartResponse:
+    """
+    Patient with encounters, vitals, lab results, medications, appointments
+    and, for `user_id`, the mail count, fetched concurrently
+    """
+    if user_id is not None and not has_scope(claims, "mails:get"):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Forbidden")
+
+    chart = await get_patient_chart_service(
+        patient_id=patient_id, token=token, user_id=user_id
+    )
+    return chart
 
 
 @router.post(
@@ -72,6 +191,47 @@ async def create_patient(
     return patient
 
 
+@router.post(
+    "/bulk",
+    response_model=BulkResponse,
+    status_code=status.HTTP_200_OK,
+    dependencies=[
+        Depends(check_scope("patients:create")),
+        Depends(with_priority(RequestPriorityEnum.LOW)),
+    ],
+)
+async def create_patients_bulk(
+    items: Annotated[list[PatientResponse], Depends(bulk_items(PatientResponse))],
+    token: str = Depends(get_bearer_token),
+) -> BulkResponse:
+    """
+    Create patients from a JSON array or NDJSON body, with a status per item
+    """
+    result = await create_patients_bulk_service(items=items, token=token)
+    return result
+
+
+@router.put(
+    "/bulk",
+    response_model=BulkResponse,
+    status_code=status.HTTP_200_OK,
+    dependencies=[
+        Depends(check_scope("patients:update")),
+        Depends(with_priority(RequestPriorityEnum.LOW)),
+    ],
+)
+async def update_patients_bulk(
+    items: Annotated[list[PatientResponse], Depends(bulk_items(PatientResponse))],
+    token: str = Depends(get_bearer_token),
+) -> BulkResponse:
+    """
+    Update patients by id from a JSON array or NDJSON body, with a status per
+    item
+    """
+    result = await update_patients_bulk_service(items=items, token=token)
+    return result
+
+
 @router.put(
     "/{patient_id}",
     response_model=PatientDetailResponse,
@@ -1,31 +1,113 @@
+import hashlib
+import time
+
 import httpx
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import (
     HTTPAuthorizationCredentials,
     HTTPBearer,
 )
 
-from project.auth_setup import auth0
+from project.auth_setup import auth0, jwks_cache
+from project.config import get_settings
 from project.db.models.user import TokenResponse
 from project.globals import (
     AUTH0_API_AUDIENCE,
     AUTH0_CLIENT_ID,
     AUTH0_CLIENT_SECRET,
-    AUTH0_DOMAIN,
 )
+from project.m2m_token_cache import M2MTokenCache
+from project.metrics import auth_verification_duration
+from project.timing import record_timing
+from project.tracing import start_span
+from project.ttl_cache import TTLCache
+from project.upstream.clients import AUTH0, upstream_clients
 
 bearer_scheme = HTTPBearer(auto_error=True)
 
+# One shared dependency instance, so FastAPI verifies the token once per request
+# and reuses the claims for every dependency that needs them
+require_auth = auth0.require_auth()
+
+# Claims of already verified bearer tokens, keyed by a hash of the token and
+# kept until the token expires
+verified_tokens: TTLCache[dict] = TTLCache(max_size=get_settings().token_cache_max_size)
+
+
+def _token_key(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+async def get_claims(request: Request) -> dict:
+    """
+    Verified claims of the bearer token of the current request.
+    FastAPI resolves this once per request and shares it with every dependant,
+    the claims are also kept on the request for code that calls it directly.
+    Repeated requests with the same token are served from `verified_tokens`.
+    DPoP bound tokens are always verified, their proof differs per request.
+    """
+    claims = getattr(request.state, "claims", None)
+    if claims is not None:
+        return claims
+
+    scheme, _, token = request.headers.get("authorization", "").partition(" ")
+    cacheable = scheme.lower() == "bearer" and bool(token)
+
+    if cacheable:
+        claims = verified_tokens.get(_token_key(token))
+        if claims is not None:
+            record_timing("auth", 0.0, "cached")
+            request.state.claims = claims
+            return claims
+
+    if token:
+        await jwks_cache.ensure_key_for(token)
+
+    started = time.perf_counter()
+    try:
+        with start_span("auth verify"):
+            claims = await require_auth(request)
+    finally:
+        elapsed = time.perf_counter() - started
+        auth_verification_duration.observe(elapsed)
+        record_timing("auth", elapsed, "verified")
+
+    if cacheable and isinstance(claims.get("exp"), int | float):
+        ttl = claims["exp"] - time.time()
+        verified_tokens.set(_token_key(token), claims, ttl=ttl)
+    request.state.claims = claims
+    return claims
+
 
 def get_bearer_token(
     token: HTTPAuthorizationCredentials = Depends(bearer_scheme),
-    _: dict = Depends(auth0.require_auth()),
+    _: dict = Depends(get_claims),
 ) -> str:
     if token.scheme.lower() != "bearer":
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED)
     return token.credentials
 
 
+def get_token_fingerprint(token: str) -> str:
+    """
+    Identifies the caller of a token without keeping the token itself
+    """
+    return f"token:{_token_key(token)}"
+
+
+def get_token_scope(token: str) -> str:
+    """
+    Authorization scope of an already verified token, used to partition caches
+    that are shared between callers. Falls back to the token itself when its
+    claims are not cached.
+    """
+    claims = verified_tokens.peek(_token_key(token))
+    if claims is None:
+        return get_token_fingerprint(token)
+    scopes = sorted(set((claims.get("scope") or "").split()))
+    return f"scope:{' '.join(scopes)}"
+
+
 def create_header(token: str) -> dict:
     """
     Create header
@@ -33,10 +115,16 @@ def create_header(token: str) -> dict:
     return {"Authorization": f"Bearer {token}"}
 
 
+def has_scope(claims: dict, required: str) -> bool:
+    """
+    Whether verified claims grant the scope `required`
+    """
+    return required in set((claims.get("scope") or "").split())
+
+
 def check_scope(required: str):
-    async def dep(claims: dict = Depends(auth0.require_auth())):
-        scopes = set((claims.get("scope") or "").split())
-        if required not in scopes:
+    async def dep(claims: dict = Depends(get_claims)):
+        if not has_scope(claims, required):
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN, detail="Forbidden"
             )
@@ -45,12 +133,11 @@ def check_scope(required: str):
     return dep
 
 
-async def create_token_service() -> TokenResponse:
+async def request_m2m_token() -> TokenResponse:
     """
-    Create token for the user (only for debug)
+    Request a new token from Auth0 with the client credentials of the gateway
     """
 
-    url = f"https://{AUTH0_DOMAIN}/oauth/token"
     payload = {
         "grant_type": "client_credentials",
         "client_id": AUTH0_CLIENT_ID,
@@ -59,9 +146,8 @@ async def create_token_service() -> TokenResponse:
     }
 
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.post(url, data=payload)
-            response.raise_for_status()
+        response = await upstream_clients.get(AUTH0).post("/oauth/token", data=payload)
+        response.raise_for_status()
     except httpx.RequestError as exc:
         raise HTTPException(
             status_code=status.HTTP_502_BAD_GATEWAY, detail="Auth0 niet bereikbaar"
@@ -74,3 +160,17 @@ async def create_token_service() -> TokenResponse:
 
     data = response.json()
     return TokenResponse.model_validate(data)
+
+
+# Token of `/auth/login`, reused until shortly before it expires
+m2m_tokens = M2MTokenCache(
+    fetch=request_m2m_token,
+    refresh_margin=get_settings().m2m_token_refresh_margin,
+)
+
+
+async def create_token_service() -> TokenResponse:
+    """
+    Create token for the user (only for debug)
+    """
+    return await m2m_tokens.get()
@@ -0,0 +1,271 @@
+import asyncio
+from contextlib import aclosing
+from typing import AsyncIterator, Awaitable, Callable, TypeVar
+
+from fastapi import HTTPException, status
+
+from project.config import get_settings
+from project.db.models.basemodel import PaginationResponse
+from project.db.models.chart import (
+    PaginatedAppointmentResponse,
+    PaginatedLabResultResponse,
+    PaginatedMedicationResponse,
+    PaginatedVitalResponse,
+    PatientChartResponse,
+)
+from project.db.models.details import PatientDetailResponse
+from project.db.models.encounter import PaginatedEncounterResponse
+from project.db.models.mail import MailCountResponse
+from project.pagination import iterate_pages
+from project.services.encounter_service import iter_encounters_service
+from project.services.mail_service import get_mail_count
+from project.services.patients_service import get_patient_by_id_service
+from project.upstream.clients import EPD
+from project.upstream.engine import call_upstream
+
+ItemT = TypeVar("ItemT")
+PartT = TypeVar("PartT")
+
+# Result of one part of the chart
+ChartPart = (
+    PatientDetailResponse
+    | PaginatedEncounterResponse
+    | PaginatedVitalResponse
+    | PaginatedLabResultResponse
+    | PaginatedMedicationResponse
+    | PaginatedAppointmentResponse
+    | MailCountResponse
+)
+
+
+async def get_vitals_service(
+    patient_id: int,
+    token: str,
+    page: int | None = None,
+    limit: int | None = None,
+) -> PaginatedVitalResponse:
+    """
+    Get a page of the vital signs of a patient
+    """
+    params = {"patientId": patient_id, "page": page, "limit": limit}
+
+    return await call_upstream(
+        EPD,
+        "GET",
+        "/api/vitals",
+        token,
+        operation="get_vitals_service",
+        params=params,
+        response_model=PaginatedVitalResponse,
+    )
+
+
+async def get_lab_results_service(
+    patient_id: int,
+    token: str,
+    page: int | None = None,
+    limit: int | None = None,
+) -> PaginatedLabResultResponse:
+    """
+    Get a page of the lab results of a patient
+    """
+    params = {"patientId": patient_id, "page": page, "limit": limit}
+
+    return await call_upstream(
+        EPD,
+        "GET",
+        "/api/lab-results",
+        token,
+        operation="get_lab_results_service",
+        params=params,
+        response_model=PaginatedLabResultResponse,
+    )
+
+
+async def get_medications_service(
+    patient_id: int,
+    token: str,
+    page: int | None = None,
+    limit: int | None = None,
+) -> PaginatedMedicationResponse:
+    """
+    Get a page of the medication orders of a patient
+    """
+    params = {"patientId": patient_id, "page": page, "limit": limit}
+
+    return await call_upstream(
+        EPD,
+        "GET",
+        "/api/medications",
+        token,
+        operation="get_medications_service",
+        params=params,
+        response_model=PaginatedMedicationResponse,
+    )
+
+
+async def get_appointments_service(
+    patient_id: int,
+    token: str,
+    page: int | None = None,
+    limit: int | None = None,
+) -> PaginatedAppointmentResponse:
+    """
+    Get a page of the appointments of a patient
+    """
+    params = {"patientId": patient_id, "page": page, "limit": limit}
+
+    return await call_upstream(
+        EPD,
+        "GET",
+        "/api/appointments",
+        token,
+        operation="get_appointments_service",
+        params=params,
+        response_model=PaginatedAppointmentResponse,
+    )
+
+
+async def _first_items(
+    items: AsyncIterator[ItemT], max_items: int
+) -> tuple[list[ItemT], bool]:
+    """
+    Up to `max_items` items of a paged listing and whether any were left over.
+    Closing the listing early cancels its prefetched page.
+    """
+    collected: list[ItemT] = []
+    async with aclosing(items):
+        async for item in items:
+            if len(collected) == max_items:
+                return collected, True
+            collected.append(item)
+    return collected, False
+
+
+async def _paged_part(
+    name: str,
+    items: AsyncIterator[ItemT],
+    build: Callable[[list[ItemT], PaginationResponse], PartT],
+    truncated: list[str],
+) -> PartT:
+    """
+    One list part of the chart with the items of all its pages, as a single
+    page. `name` is added to `truncated` when the part was cut off.
+    """
+    max_items = get_settings().chart_part_max_items
+    collected, more = await _first_items(items, max_items)
+    if more:
+        truncated.append(name)
+    pagination = PaginationResponse(
+        page=1, limit=max_items, total=len(collected), totalPages=1
+    )
+    return build(collected, pagination)
+
+
+async def _branch(
+    part: Awaitable[ChartPart], timeout: float
+) -> ChartPart | HTTPException:
+    """
+    Await one part of the chart, returning its error instead of raising it
+    """
+    try:
+        return await asyncio.wait_for(part, timeout=timeout)
+    except HTTPException as exc:
+        return exc
+    except TimeoutError:
+        return HTTPException(
+            status_code=status.HTTP_504_GATEWAY_TIMEOUT, detail="Timed out"
+        )
+
+
+async def get_patient_chart_service(
+    patient_id: int, token: str, user_id: int | None = None
+) -> PatientChartResponse:
+    """
+    Get a patient with all parts of their chart, requested concurrently.
+    List parts are paged through up to `chart_part_max_items` items each,
+    longer ones are cut off and reported in `truncated`.
+    Parts other than the patient itself that fail or time out are left out
+    and reported in `errors`. The mail count is only added for `user_id`.
+    """
+    settings = get_settings()
+    size = settings.chart_page_size
+    truncated: list[str] = []
+
+    async def vitals(page: int) -> PaginatedVitalResponse:
+        return await get_vitals_service(patient_id, token, page=page, limit=size)
+
+    async def lab_results(page: int) -> PaginatedLabResultResponse:
+        return await get_lab_results_service(patient_id, token, page=page, limit=size)
+
+    async def medications(page: int) -> PaginatedMedicationResponse:
+        return await get_medications_service(patient_id, token, page=page, limit=size)
+
+    async def appointments(page: int) -> PaginatedAppointmentResponse:
+        return await get_appointments_service(patient_id, token, page=page, limit=size)
+
+    parts: dict[str, Awaitable[ChartPart]] = {
+        "patient": get_patient_by_id_service(patient_id=patient_id, token=token),
+        "encounters": _paged_part(
+            "encounters",
+            iter_encounters_service(token=token, limit=size, patient_id=patient_id),
+            lambda items, pagination: PaginatedEncounterResponse(
+                encounters=items, pagination=pagination
+            ),
+            truncated,
+        ),
+        "vitals": _paged_part(
+            "vitals",
+            iterate_pages(vitals, lambda r: r.vitals, lambda r: r.pagination),
+            lambda items, pagination: PaginatedVitalResponse(
+                vitals=items, pagination=pagination
+            ),
+            truncated,
+        ),
+        "labResults": _paged_part(
+            "labResults",
+            iterate_pages(lab_results, lambda r: r.labResults, lambda r: r.pagination),
+            lambda items, pagination: PaginatedLabResultResponse(
+                labResults=items, pagination=pagination
+            ),
+            truncated,
+        ),
+        "medications": _paged_part(
+            "medications",
+            iterate_pages(medications, lambda r: r.medications, lambda r: r.pagination),
+            lambda items, pagination: PaginatedMedicationResponse(
+                medications=items, pagination=pagination
+            ),
+            truncated,
+        ),
+        "appointments": _paged_part(
+            "appointments",
+            iterate_pages(
+                appointments, lambda r: r.appointments, lambda r: r.pagination
+            ),
+            lambda items, pagination: PaginatedAppointmentResponse(
+                appointments=items, pagination=pagination
+            ),
+            truncated,
+        ),
+    }
+    if user_id is not None:
+        parts["mailCount"] = get_mail_count(token=token, user_id=user_id)
+
+    results = await asyncio.gather(
+        *(_branch(part, settings.chart_part_timeout) for part in parts.values())
+    )
+
+    chart: dict[str, ChartPart] = {}
+    errors: dict[str, str] = {}
+    for name, result in zip(parts, results, strict=True):
+        if isinstance(result, HTTPException):
+            if name == "patient":
+                raise result
+            errors[name] = str(result.detail)
+        else:
+            chart[name] = result
+
+    return PatientChartResponse(
+        **chart, errors=errors, truncated=sorted(set(truncated) - set(errors))
+    )
@@ -1,18 +1,33 @@
-from typing import Annotated
+from typing import Annotated, AsyncIterator
 
-import httpx
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, status
+from pydantic import BaseModel
 
-from project.db.models.details import EncounterDetailResponse
+from project.bulk import succeeded, summarize_bulk
+from project.config import get_settings
+from project.db.models.batch import BulkResponse, EncounterBatchResponse
+from project.db.models.details import ENCOUNTER_RELATIONS, EncounterDetailResponse
 from project.db.models.encounter import (
+    EncounterListResponse,
     EncounterResponse,
     PaginatedEncounterResponse,
 )
-from project.db.models.enums import EncounterStatusEnum, EncounterTypeEnum
-from project.globals import EPD_URL
-from project.services.auth_service import create_header
+from project.db.models.enums import (
+    EncounterStatusEnum,
+    EncounterTypeEnum,
+    EventActionEnum,
+    EventTopicEnum,
+)
+from project.db.models.event import EventOut
+from project.events import event_broker
+from project.pagination import iterate_pages, next_cursor
+from project.projection import FieldSelection, projected_model
+from project.upstream.batch import fetch_many, run_bounded
+from project.upstream.cache import ENCOUNTERS, PATIENTS, response_cache
+from project.upstream.clients import EPD
+from project.upstream.engine import call_upstream, stream_upstream
 
-url_prefix = f"{EPD_URL}/api/encounters"
+url_prefix = "/api/encounters"
 
 
 async def get_encounters_service(
@@ -22,12 +37,74 @@ async def get_encounters_service(
     encounter_id: int | None = None,
     encounter_status: EncounterStatusEnum | None = None,
     encounter_type: EncounterTypeEnum | None = None,
+    patient_id: int | None = None,
 ) -> PaginatedEncounterResponse:
     """
     Get all encounters
     """
 
-    epd_url = url_prefix
+    params = {
+        "page": page,
+        "limit": limit,
+        "encounterId": encounter_id,
+        "status": encounter_status,
+        "type": encounter_type,
+        "patientId": patient_id,
+    }
+    encounters = await call_upstream(
+        EPD,
+        "GET",
+        url_prefix,
+        token,
+        operation="get_encounters_service",
+        params=params,
+        response_model=PaginatedEncounterResponse,
+        cache_resource=ENCOUNTERS,
+    )
+    encounters.nextCursor = next_cursor(encounters.pagination)
+    return encounters
+
+
+def iter_encounters_service(
+    token: str,
+    limit: int | None = None,
+    encounter_status: EncounterStatusEnum | None = None,
+    encounter_type: EncounterTypeEnum | None = None,
+    patient_id: int | None = None,
+) -> AsyncIterator[EncounterListResponse]:
+    """
+    Walk all encounters page by page, as used for the patient chart
+    """
+
+    async def fetch_page(page: int) -> PaginatedEncounterResponse:
+        return await get_encounters_service(
+            token=token,
+            page=page,
+            limit=limit,
+            encounter_status=encounter_status,
+            encounter_type=encounter_type,
+            patient_id=patient_id,
+        )
+
+    return iterate_pages(
+        fetch_page,
+        lambda result: result.encounters,
+        lambda result: result.pagination,
+    )
+
+
+async def stream_encounters_service(
+    token: str,
+    page: int | None = None,
+    limit: int | None = None,
+    encounter_id: int | None = None,
+    encounter_status: EncounterStatusEnum | None = None,
+    encounter_type: EncounterTypeEnum | None = None,
+) -> AsyncIterator[bytes]:
+    """
+    Get all encounters as the unvalidated JSON body of EPD, streamed in chunks
+    """
+
     params = {
         "page": page,
         "limit": limit,
@@ -35,26 +112,9 @@ async def get_encounters_service(
         "status": encounter_status,
         "type": encounter_type,
     }
-    params = {k: v for k, v in params.items() if v is not None}
-
-    try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                epd_url, params=params, headers=create_header(token)
-            )
-            response.raise_for_status()
-    except httpx.RequestError as exc:
-        raise HTTPException(
-            status_code=status.HTTP_502_BAD_GATEWAY, detail="EPD niet bereikbaar"
-        ) from exc
-    except httpx.HTTPStatusError as exc:
-        raise HTTPException(
-            status_code=exc.response.status_code,
-            detail=exc.response.text,
-        ) from exc
-
-    data = response.json()
-    return PaginatedEncounterResponse.model_validate(data)
+    return await stream_upstream(
+        EPD, url_prefix, token, operation="stream_encounters_service", params=params
+    )
 
 
 async def get_encounter_by_id_service(
@@ -63,24 +123,53 @@ async def get_encounter_by_id_service(
     """
     Get a encounter by uuid
     """
-    epd_url = f"{url_prefix}/{encounter_id}"
+    return await call_upstream(
+        EPD,
+        "GET",
+        f"{url_prefix}/{encounter_id}",
+        token,
+        operation="get_encounter_by_id_service",
+        response_model=EncounterDetailResponse,
+        cache_resource=ENCOUNTERS,
+    )
+
+
+async def get_encounters_by_ids_service(
+    encounter_ids: list[int], token: str
+) -> EncounterBatchResponse:
+    """
+    Get several encounters by id, duplicates are fetched once.
+    Cached encounters are served from the response cache, the others are
+    requested from EPD a few at a time.
+    """
+
+    async def fetch(encounter_id: int) -> EncounterDetailResponse:
+        return await get_encounter_by_id_service(encounter_id=encounter_id, token=token)
 
-    try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(epd_url, headers=create_header(token))
-            response.raise_for_status()
-    except httpx.RequestError as exc:
-        raise HTTPException(
-            status_code=status.HTTP_502_BAD_GATEWAY, detail="EPD niet bereikbaar"
-        ) from exc
-    except httpx.HTTPStatusError as exc:
-        raise HTTPException(
-            status_code=exc.response.status_code,
-            detail=exc.response.text,
-        ) from exc
+    items, errors = await fetch_many(
+        encounter_ids, fetch, concurrency=get_settings().batch_concurrency
+    )
+    return EncounterBatchResponse(items=items, errors=errors)
 
-    data = response.json()
-    return EncounterDetailResponse.model_validate(data)
+
+async def get_encounter_selection_service(
+    encounter_id: int, token: str, selection: FieldSelection
+) -> BaseModel:
+    """
+    Get a encounter by uuid with only the selected fields and relations
+    """
+    return await call_upstream(
+        EPD,
+        "GET",
+        f"{url_prefix}/{encounter_id}",
+        token,
+        operation="get_encounter_selection_service",
+        params=selection.params(),
+        response_model=projected_model(
+            EncounterDetailResponse, ENCOUNTER_RELATIONS, selection
+        ),
+        cache_resource=ENCOUNTERS,
+    )
 
 
 async def create_encounter_service(
@@ -90,26 +179,9 @@ async def create_encounter_service(
     Create a new encounter
     """
 
-    epd_url = url_prefix
-    payload = form_data.model_dump(by_alias=True)
-    try:
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                epd_url, json=payload, headers=create_header(token)
-            )
-            response.raise_for_status()
-    except httpx.RequestError as exc:
-        raise HTTPException(
-            status_code=status.HTTP_502_BAD_GATEWAY, detail="EPD niet bereikbaar"
-        ) from exc
-    except httpx.HTTPStatusError as exc:
-        raise HTTPException(
-            status_code=exc.response.status_code,
-            detail=exc.response.text,
-        ) from exc
-
-    data = response.json()
-    return EncounterDetailResponse.model_validate(data)
+    encounter = await _create_encounter(form_data=form_data, token=token)
+    await _encounters_saved(EventActionEnum.CREATED, [encounter])
+    return encounter
 
 
 async def update_encounter_service(
@@ -119,49 +191,132 @@ async def update_encounter_service(
     Update info on an encounter
     """
 
-    epd_url = url_prefix
-    params = {"id": encounter_id}
-    payload = form_data.model_dump(by_alias=True)
+    encounter = await _update_encounter(
+        encounter_id=encounter_id, form_data=form_data, token=token
+    )
+    await _encounters_saved(EventActionEnum.UPDATED, [encounter])
+    return encounter
+
+
+async def create_encounters_bulk_service(
+    items: list[EncounterResponse], token: str
+) -> BulkResponse:
+    """
+    Create several encounters, a few at a time, with a status per item.
+    The cache is invalidated and the change published once for the batch.
+    """
+
+    async def create(item: EncounterResponse) -> EncounterDetailResponse:
+        return await _create_encounter(form_data=item, token=token)
+
+    results = await run_bounded(
+        items, create, concurrency=get_settings().batch_concurrency
+    )
+    await _encounters_saved(EventActionEnum.CREATED, succeeded(results))
+    return summarize_bulk(results, success_status=status.HTTP_201_CREATED)
+
+
+async def update_encounters_bulk_service(
+    items: list[EncounterResponse], token: str
+) -> BulkResponse:
+    """
+    Update several encounters by their id, a few at a time, with a status
+    per item. The cache is invalidated and the change published once for the
+    batch.
+    """
+
+    async def update(item: EncounterResponse) -> EncounterDetailResponse:
+        return await _update_encounter(
+            encounter_id=item.id, form_data=item, token=token
+        )
 
-    try:
-        async with httpx.AsyncClient() as client:
-            response = await client.put(
-                epd_url, params=params, json=payload, headers=create_header(token)
-            )
-            response.raise_for_status()
-    except httpx.RequestError as exc:
-        raise HTTPException(
-            status_code=status.HTTP_502_BAD_GATEWAY, detail="EPD niet bereikbaar"
-        ) from exc
-    except httpx.HTTPStatusError as exc:
-        raise HTTPException(
-            status_code=exc.response.status_code,
-            detail=exc.response.text,
-        ) from exc
-
-    data = response.json()
-    return EncounterDetailResponse.model_validate(data)
+    results = await run_bounded(
+        items, update, concurrency=get_settings().batch_concurrency
+    )
+    await _encounters_saved(EventActionEnum.UPDATED, succeeded(results))
+    return summarize_bulk(results, success_status=status.HTTP_200_OK)
 
 
 async def delete_encounter_service(encounter_id: int, token: str) -> None:
     """
     Delete an encounter
     """
-    epd_url = url_prefix
     params = {"id": encounter_id}
 
-    try:
-        async with httpx.AsyncClient() as client:
-            response = await client.delete(
-                epd_url, params=params, headers=create_header(token)
-            )
-            response.raise_for_status()
-    except httpx.RequestError as exc:
-        raise HTTPException(
-            status_code=status.HTTP_502_BAD_GATEWAY, detail="EPD niet bereikbaar"
-        ) from exc
-    except httpx.HTTPStatusError as exc:
-        raise HTTPException(
-            status_code=exc.response.status_code,
-            detail=exc.response.text,
-        ) from exc
+    await call_upstream(
+        EPD,
+        "DELETE",
+        url_prefix,
+        token,
+        operation="delete_encounter_service",
+        params=params,
+    )
+    await _encounters_changed(EventActionEnum.DELETED, [encounter_id])
+
+
+async def _create_encounter(
+    form_data: EncounterResponse, token: str
+) -> EncounterDetailResponse:
+    payload = form_data.model_dump(by_alias=True)
+    return await call_upstream(
+        EPD,
+        "POST",
+        url_prefix,
+        token,
+        operation="create_encounter_service",
+        body=payload,
+        response_model=EncounterDetailResponse,
+    )
+
+
+async def _update_encounter(
+    encounter_id: int, form_data: EncounterResponse, token: str
+) -> EncounterDetailResponse:
+    params = {"id": encounter_id}
+    payload = form_data.model_dump(by_alias=True)
+    return await call_upstream(
+        EPD,
+        "PUT",
+        url_prefix,
+        token,
+        operation="update_encounter_service",
+        params=params,
+        body=payload,
+        response_model=EncounterDetailResponse,
+    )
+
+
+async def _encounters_saved(
+    action: EventActionEnum, encounters: list[EncounterDetailResponse]
+) -> None:
+    """
+    Publish the change of encounters that were created or updated, with their
+    patient when it is a single encounter
+    """
+    patient_id = encounters[0].patientId if len(encounters) == 1 else None
+    await _encounters_changed(
+        action, [encounter.id for encounter in encounters], patient_id=patient_id
+    )
+
+
+async def _encounters_changed(
+    action: EventActionEnum, encounter_ids: list[int], patient_id: int | None = None
+) -> None:
+    """
+    Invalidate the cached patients and encounters and publish one event for
+    the changed encounters, nothing when none changed
+    """
+    if not encounter_ids:
+        return
+    await response_cache.invalidate(PATIENTS, ENCOUNTERS)
+    ids = [str(encounter_id) for encounter_id in encounter_ids]
+    if len(ids) == 1:
+        event = EventOut(
+            topic=EventTopicEnum.ENCOUNTERS,
+            action=action,
+            id=ids[0],
+            patientId=patient_id,
+        )
+    else:
+        event = EventOut(topic=EventTopicEnum.ENCOUNTERS, action=action, ids=ids)
+    event_broker.publish(event)
@@ -0,0 +1,18 @@
+from project.db.models.health import HealthResponse
+from project.upstream.limiter import upstream_limiters
+from project.upstream.resilience import upstream_guards
+
+
+def get_health_service() -> HealthResponse:
+    """
+    Circuit breaker, retry budget and concurrency limit of every upstream
+    """
+    upstreams = {
+        name: {
+            **guard.breaker.stats(),
+            "retries_exhausted": guard.budget.exhausted,
+            **upstream_limiters[name].stats(),
+        }
+        for name, guard in upstream_guards.items()
+    }
+    return HealthResponse.model_validate({"upstreams": upstreams})
@@ -1,50 +1,117 @@
-from typing import Annotated
+from datetime import datetime, timezone
+from typing import Annotated, TypeVar
 
-import httpx
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends
 
+from project.config import get_settings
+from project.db.models.enums import EventActionEnum, EventTopicEnum
+from project.db.models.event import EventOut
 from project.db.models.mail import (
     CreateMailResponse,
     GetMailByIdResponse,
+    GetMailHeadersByUserResponse,
     GetMailsByUserResponse,
     MailCountResponse,
     MailCreate,
+    MailHeaderOut,
+    MailOut,
     MarkMailReadResponse,
+    UserMailHeadersOut,
+    UserMailsOut,
 )
-from project.globals import MAIL_URL
-from project.services.auth_service import create_header
+from project.events import event_broker
+from project.pagination import KeysetCursor, keyset_page
+from project.ttl_cache import TTLCache
+from project.upstream.clients import MAIL
+from project.upstream.engine import call_upstream
 
-route_prefix = f"{MAIL_URL}/api/mails"
+route_prefix = "/api/mails"
 
+MailT = TypeVar("MailT", MailOut, MailHeaderOut)
 
-async def get_mail_by_user(token: str, user_id: int) -> GetMailsByUserResponse:
+# Mail counters per user id. Mails created, read or deleted through the gateway
+# update them in place, changes made elsewhere show up once the ttl expires.
+mail_counts: TTLCache[MailCountResponse] = TTLCache(
+    max_size=get_settings().mail_count_cache_max_size
+)
+
+
+def _publish(action: EventActionEnum, mail_id: str, user_id: str) -> None:
+    event_broker.publish(
+        EventOut(topic=EventTopicEnum.MAILS, action=action, id=mail_id, userId=user_id)
+    )
+
+
+def _adjust_count(user_id: str, unread: int, total: int) -> None:
+    count = mail_counts.peek(user_id)
+    if count is None:
+        return
+    mail_counts.replace(
+        user_id,
+        MailCountResponse(
+            unreadCount=max(count.unreadCount + unread, 0),
+            totalCount=max(count.totalCount + total, 0),
+        ),
+    )
+
+
+def _updated_since(mails: list[MailT], since: datetime | None) -> list[MailT]:
+    # A naive since is taken as UTC, like the timestamps of the mail service
+    if since is None:
+        return mails
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+    return [mail for mail in mails if mail.updatedAt > since]
+
+
+async def get_mail_by_user(
+    token: str,
+    user_id: int,
+    limit: int | None = None,
+    cursor: KeysetCursor | None = None,
+    since: datetime | None = None,
+) -> GetMailsByUserResponse:
+    """
+    Get the mails of a user, newest first.
+    `limit` and `cursor` page through the mailbox, `since` only keeps mails
+    updated after that moment (incremental sync). The mail service cannot
+    page, so the whole mailbox is loaded and paged here.
+    """
+    mails = await call_upstream(
+        MAIL,
+        "GET",
+        f"{route_prefix}/user/{user_id}",
+        token,
+        operation="get_mail_by_user",
+        response_model=UserMailsOut,
+    )
+
+    page, next_page = keyset_page(_updated_since(mails.root, since), limit, cursor)
+    return GetMailsByUserResponse(items=page, nextCursor=next_page)
+
+
+async def get_mail_headers_by_user(
+    token: str,
+    user_id: int,
+    limit: int | None = None,
+    cursor: KeysetCursor | None = None,
+    since: datetime | None = None,
+) -> GetMailHeadersByUserResponse:
     """
-    Get all mails by user
+    Get the mails of a user without their body, paged like `get_mail_by_user`.
+    The bodies are still loaded from the mail service and dropped here.
     """
-    route_url = f"{route_prefix}/user/"
-    params = {"userId": user_id}
-
-    params = {k: v for k, v in params.items() if v is not None}
-
-    try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                route_url, params=params, headers=create_header(token)
-            )
-            response.raise_for_status()
-    except httpx.RequestError as exc:
-        raise HTTPException(
-            status_code=status.HTTP_502_BAD_GATEWAY,
-            detail="Mail service niet bereikbaar",
-        ) from exc
-    except httpx.HTTPStatusError as exc:
-        raise HTTPException(
-            status_code=exc.response.status_code,
-            detail=exc.response.text,
-        ) from exc
-
-    data = response.json()
-    return GetMailsByUserResponse.model_validate(data)
+    mails = await call_upstream(
+        MAIL,
+        "GET",
+        f"{route_prefix}/user/{user_id}",
+        token,
+        operation="get_mail_headers_by_user",
+        response_model=UserMailHeadersOut,
+    )
+
+    page, next_page = keyset_page(_updated_since(mails.root, since), limit, cursor)
+    return GetMailHeadersByUserResponse(items=page, nextCursor=next_page)
 
 
 async def get_mail_by_id(token: str, mail_id: int) -> GetMailByIdResponse:
@@ -52,29 +119,14 @@ async def get_mail_by_id(token: str, mail_id: int) -> GetMailByIdResponse:
     Get a mail based on id.
     Only mails of the logged in user can be gained
     """
-    route_url = route_prefix
-    params = {"id": mail_id}
-    params = {k: v for k, v in params.items() if v is not None}
-
-    try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                route_url, params=params, headers=create_header(token)
-            )
-            response.raise_for_status()
-    except httpx.RequestError as exc:
-        raise HTTPException(
-            status_code=status.HTTP_502_BAD_GATEWAY,
-            detail="Mail service niet bereikbaar",
-        ) from exc
-    except httpx.HTTPStatusError as exc:
-        raise HTTPException(
-            status_code=exc.response.status_code,
-            detail=exc.response.text,
-        ) from exc
-
-    data = response.json()
-    return GetMailByIdResponse.model_validate(data)
+    return await call_upstream(
+        MAIL,
+        "GET",
+        f"{route_prefix}/{mail_id}",
+        token,
+        operation="get_mail_by_id",
+        response_model=GetMailByIdResponse,
+    )
 
 
 async def create_mail(
@@ -83,102 +135,79 @@ async def create_mail(
     """
     Create a new mail for the logged in user:
     """
-    route_url = route_prefix
     payload = form_data.model_dump(by_alias=True)
 
-    try:
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                route_url, json=payload, headers=create_header(token)
-            )
-            response.raise_for_status()
-    except httpx.RequestError as exc:
-        raise HTTPException(
-            status_code=status.HTTP_502_BAD_GATEWAY,
-            detail="Mail service niet bereikbaar",
-        ) from exc
-    except httpx.HTTPStatusError as exc:
-        raise HTTPException(
-            status_code=exc.response.status_code,
-            detail=exc.response.text,
-        ) from exc
-
-    data = response.json()
-    return CreateMailResponse.model_validate(data)
+    mail = await call_upstream(
+        MAIL,
+        "POST",
+        route_prefix,
+        token,
+        operation="create_mail",
+        body=payload,
+        response_model=CreateMailResponse,
+    )
+    _adjust_count(mail.userId, unread=0 if mail.isRead else 1, total=1)
+    _publish(EventActionEnum.CREATED, mail.id, mail.userId)
+    return mail
 
 
 async def mark_mail_as_read(token: str, mail_id: int) -> MarkMailReadResponse:
     """
-    Mark a mail of the logged in user as read
+    Mark a mail of the logged in user as read.
+    The mail is looked up first, marking an already read mail leaves the
+    unread counter alone.
     """
-
-    route_url = f"{route_prefix}/{mail_id}/read"
-
-    try:
-        async with httpx.AsyncClient() as client:
-            response = await client.patch(route_url, headers=create_header(token))
-            response.raise_for_status()
-    except httpx.RequestError as exc:
-        raise HTTPException(
-            status_code=status.HTTP_502_BAD_GATEWAY,
-            detail="Mail service niet bereikbaar",
-        ) from exc
-    except httpx.HTTPStatusError as exc:
-        raise HTTPException(
-            status_code=exc.response.status_code,
-            detail=exc.response.text,
-        ) from exc
-
-    data = response.json()
-    return MarkMailReadResponse.model_validate(data)
+    previous = await get_mail_by_id(token, mail_id)
+
+    mail = await call_upstream(
+        MAIL,
+        "PATCH",
+        f"{route_prefix}/{mail_id}/read",
+        token,
+        operation="mark_mail_as_read",
+        response_model=MarkMailReadResponse,
+    )
+    if not previous.isRead:
+        _adjust_count(mail.userId, unread=-1, total=0)
+    _publish(EventActionEnum.READ, mail.id, mail.userId)
+    return mail
 
 
 async def delete_mail_by_id(token: str, mail_id: int) -> None:
     """
-    Delete a mail of the logged in user
+    Delete a mail of the logged in user.
+    The mail is looked up first to know which counters it is part of, the
+    counters are only adjusted once the delete succeeded.
     """
+    previous = await get_mail_by_id(token, mail_id)
 
-    route_url = route_prefix
-    params = {"id": mail_id}
-    params = {k: v for k, v in params.items() if v is not None}
-
-    try:
-        async with httpx.AsyncClient() as client:
-            response = await client.delete(route_url, headers=create_header(token))
-            response.raise_for_status()
-    except httpx.RequestError as exc:
-        raise HTTPException(
-            status_code=status.HTTP_502_BAD_GATEWAY,
-            detail="Mail service niet bereikbaar",
-        ) from exc
-    except httpx.HTTPStatusError as exc:
-        raise HTTPException(
-            status_code=exc.response.status_code,
-            detail=exc.response.text,
-        ) from exc
+    await call_upstream(
+        MAIL,
+        "DELETE",
+        f"{route_prefix}/{mail_id}",
+        token,
+        operation="delete_mail_by_id",
+    )
+    _adjust_count(previous.userId, unread=0 if previous.isRead else -1, total=-1)
+    _publish(EventActionEnum.DELETED, previous.id, previous.userId)
 
 
 async def get_mail_count(token: str, user_id: int) -> MailCountResponse:
     """
-    Get amount of mails a user has in their inbox
+    Get amount of mails a user has in their inbox, served from `mail_counts`
+    while it is cached
     """
-
-    route_url = f"{route_prefix}/user/{user_id}/count"
-
-    try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(route_url, headers=create_header(token))
-            response.raise_for_status()
-    except httpx.RequestError as exc:
-        raise HTTPException(
-            status_code=status.HTTP_502_BAD_GATEWAY,
-            detail="Mail service niet bereikbaar",
-        ) from exc
-    except httpx.HTTPStatusError as exc:
-        raise HTTPException(
-            status_code=exc.response.status_code,
-            detail=exc.response.text,
-        ) from exc
-
-    data = response.json()
-    return MailCountResponse.model_validate(data)
+    count = mail_counts.get(str(user_id))
+    if count is not None:
+        return count
+
+    count = await call_upstream(
+        MAIL,
+        "GET",
+        f"{route_prefix}/user/{user_id}/count",
+        token,
+        operation="get_mail_count",
+        response_model=MailCountResponse,
+    )
+    mail_counts.set(str(user_id), count, ttl=get_settings().mail_count_cache_ttl)
+    return count
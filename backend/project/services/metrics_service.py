@@ -0,0 +1,62 @@
+from project.db.models.enums import BreakerStateEnum
+from project.events import event_broker
+from project.metrics import (
+    cache_entries,
+    cache_lookups,
+    event_subscribers,
+    registry,
+    upstream_breaker_open,
+    upstream_concurrency,
+    upstream_pool_connections,
+    upstream_pool_max_connections,
+    upstream_pool_queued,
+    upstream_shed,
+)
+from project.services.auth_service import verified_tokens
+from project.services.mail_service import mail_counts
+from project.ttl_cache import TTLCache
+from project.upstream.cache import upstream_validators
+from project.upstream.clients import upstream_clients
+from project.upstream.limiter import upstream_limiters
+from project.upstream.resilience import upstream_guards
+
+# In-process caches whose hit ratio is exposed
+CACHES: dict[str, TTLCache] = {
+    "verified_tokens": verified_tokens,
+    "mail_counts": mail_counts,
+    "upstream_validators": upstream_validators,
+}
+
+
+def _collect() -> None:
+    for name, pool in upstream_clients.pool_stats().items():
+        upstream_pool_connections.set(pool["active"], name, "active")
+        upstream_pool_connections.set(pool["idle"], name, "idle")
+        upstream_pool_max_connections.set(pool["max"], name)
+        upstream_pool_queued.set(pool["queued"], name)
+
+    for name, limiter in upstream_limiters.items():
+        upstream_concurrency.set(limiter.limit, name, "limit")
+        upstream_concurrency.set(limiter.in_flight, name, "in_flight")
+        upstream_concurrency.set(limiter.queued, name, "queued")
+        upstream_shed.set(limiter.shed, name)
+
+    for name, guard in upstream_guards.items():
+        is_open = guard.breaker.state != BreakerStateEnum.CLOSED
+        upstream_breaker_open.set(int(is_open), name)
+
+    for name, cache in CACHES.items():
+        stats = cache.stats()
+        cache_entries.set(stats["size"], name)
+        cache_lookups.set(stats["hits"], name, "hit")
+        cache_lookups.set(stats["misses"], name, "miss")
+
+    event_subscribers.set(len(event_broker))
+
+
+def get_metrics_service() -> str:
+    """
+    Current metrics in the Prometheus text exposition format
+    """
+    _collect()
+    return registry.render()
@@ -1,19 +1,39 @@
-from typing import Annotated
+from typing import Annotated, AsyncIterator
 
-import httpx
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, status
+from pydantic import BaseModel
 
-from project.db.models.enums import PatientStatusEnum
-from project.db.models.patient import PaginatedPatientResponse, PatientDetailResponse
+from project.bulk import succeeded_ids, summarize_bulk
+from project.config import get_settings
+from project.db.models.batch import BulkResponse, PatientBatchResponse
+from project.db.models.details import PATIENT_RELATIONS
+from project.db.models.enums import (
+    EventActionEnum,
+    EventTopicEnum,
+    PatientListViewEnum,
+    PatientStatusEnum,
+)
+from project.db.models.event import EventOut
+from project.db.models.patient import (
+    PaginatedPatientResponse,
+    PaginatedPatientSummaryResponse,
+    PatientDetailResponse,
+)
 from project.db.models.patient_base import PatientResponse
-from project.globals import EPD_URL
-from project.services.auth_service import create_header
+from project.events import event_broker
+from project.pagination import next_cursor
+from project.projection import FieldSelection, projected_model
+from project.upstream.batch import fetch_many, run_bounded
+from project.upstream.cache import ENCOUNTERS, PATIENTS, response_cache
+from project.upstream.clients import EPD
+from project.upstream.engine import call_upstream, stream_upstream
 
-url_prefix = f"{EPD_URL}/api/patients/"
+url_prefix = "/api/patients/"
 
 
 async def get_patients_service(
     token: str,
+    page: int | None = None,
     limit: int | None = None,
     offset: int | None = None,
     patient_status: PatientStatusEnum | None = None,
@@ -23,33 +43,84 @@ async def get_patients_service(
     Get all patients
     """
 
-    epd_url = url_prefix
     params = {
+        "page": page,
         "limit": limit,
         "offset": offset,
-        "status": patient_status.value if patient_status else None,
+        "status": patient_status,
         "search": search,
     }
-    params = {k: v for k, v in params.items() if v is not None}
-
-    try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                epd_url, params=params, headers=create_header(token)
-            )
-            response.raise_for_status()
-    except httpx.RequestError as exc:
-        raise HTTPException(
-            status_code=status.HTTP_502_BAD_GATEWAY, detail="EPD niet bereikbaar"
-        ) from exc
-    except httpx.HTTPStatusError as exc:
-        raise HTTPException(
-            status_code=exc.response.status_code,
-            detail=exc.response.text,
-        ) from exc
-
-    data = response.json()
-    return PaginatedPatientResponse.model_validate(data)
+    patients = await call_upstream(
+        EPD,
+        "GET",
+        url_prefix,
+        token,
+        operation="get_patients_service",
+        params=params,
+        response_model=PaginatedPatientResponse,
+        cache_resource=PATIENTS,
+    )
+    patients.nextCursor = next_cursor(patients.pagination)
+    return patients
+
+
+async def get_patient_summaries_service(
+    token: str,
+    page: int | None = None,
+    limit: int | None = None,
+    offset: int | None = None,
+    patient_status: PatientStatusEnum | None = None,
+    search: str | None = None,
+) -> PaginatedPatientSummaryResponse:
+    """
+    Get all patients with only the fields of the patient overview.
+    EPD is asked for the summary view, nested relations are never validated.
+    """
+
+    params = {
+        "page": page,
+        "limit": limit,
+        "offset": offset,
+        "status": patient_status,
+        "search": search,
+        "view": PatientListViewEnum.SUMMARY,
+    }
+    patients = await call_upstream(
+        EPD,
+        "GET",
+        url_prefix,
+        token,
+        operation="get_patient_summaries_service",
+        params=params,
+        response_model=PaginatedPatientSummaryResponse,
+        cache_resource=PATIENTS,
+    )
+    patients.nextCursor = next_cursor(patients.pagination)
+    return patients
+
+
+async def stream_patients_service(
+    token: str,
+    page: int | None = None,
+    limit: int | None = None,
+    offset: int | None = None,
+    patient_status: PatientStatusEnum | None = None,
+    search: str | None = None,
+) -> AsyncIterator[bytes]:
+    """
+    Get all patients as the unvalidated JSON body of EPD, streamed in chunks
+    """
+
+    params = {
+        "page": page,
+        "limit": limit,
+        "offset": offset,
+        "status": patient_status,
+        "search": search,
+    }
+    return await stream_upstream(
+        EPD, url_prefix, token, operation="stream_patients_service", params=params
+    )
 
 
 async def get_patient_by_id_service(
@@ -58,27 +129,58 @@ async def get_patient_by_id_service(
     """
     Get a patient by uuid
     """
-    epd_url = url_prefix
     params = {"id": patient_id}
 
-    try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                epd_url, params=params, headers=create_header(token)
-            )
-            response.raise_for_status()
-    except httpx.RequestError as exc:
-        raise HTTPException(
-            status_code=status.HTTP_502_BAD_GATEWAY, detail="EPD niet bereikbaar"
-        ) from exc
-    except httpx.HTTPStatusError as exc:
-        raise HTTPException(
-            status_code=exc.response.status_code,
-            detail=exc.response.text,
-        ) from exc
-
-    data = response.json()
-    return PatientDetailResponse.model_validate(data)
+    return await call_upstream(
+        EPD,
+        "GET",
+        url_prefix,
+        token,
+        operation="get_patient_by_id_service",
+        params=params,
+        response_model=PatientDetailResponse,
+        cache_resource=PATIENTS,
+    )
+
+
+async def get_patients_by_ids_service(
+    patient_ids: list[int], token: str
+) -> PatientBatchResponse:
+    """
+    Get several patients by id, duplicates are fetched once.
+    Cached patients are served from the response cache, the others are
+    requested from EPD a few at a time.
+    """
+
+    async def fetch(patient_id: int) -> PatientDetailResponse:
+        return await get_patient_by_id_service(patient_id=patient_id, token=token)
+
+    items, errors = await fetch_many(
+        patient_ids, fetch, concurrency=get_settings().batch_concurrency
+    )
+    return PatientBatchResponse(items=items, errors=errors)
+
+
+async def get_patient_selection_service(
+    patient_id: int, token: str, selection: FieldSelection
+) -> BaseModel:
+    """
+    Get a patient by uuid with only the selected fields and relations
+    """
+    params = {"id": patient_id, **selection.params()}
+
+    return await call_upstream(
+        EPD,
+        "GET",
+        url_prefix,
+        token,
+        operation="get_patient_selection_service",
+        params=params,
+        response_model=projected_model(
+            PatientDetailResponse, PATIENT_RELATIONS, selection
+        ),
+        cache_resource=PATIENTS,
+    )
 
 
 async def create_patient_service(
@@ -89,26 +191,9 @@ async def create_patient_service(
     Create a new patient
     """
 
-    epd_url = url_prefix
-    payload = form_data.model_dump(by_alias=True)
-    try:
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                epd_url, json=payload, headers=create_header(token)
-            )
-            response.raise_for_status()
-    except httpx.RequestError as exc:
-        raise HTTPException(
-            status_code=status.HTTP_502_BAD_GATEWAY, detail="EPD niet bereikbaar"
-        ) from exc
-    except httpx.HTTPStatusError as exc:
-        raise HTTPException(
-            status_code=exc.response.status_code,
-            detail=exc.response.text,
-        ) from exc
-
-    data = response.json()
-    return PatientDetailResponse.model_validate(data)
+    patient = await _create_patient(form_data=form_data, token=token)
+    await _patients_changed(EventActionEnum.CREATED, [patient.id])
+    return patient
 
 
 async def update_patient_service(
@@ -118,49 +203,110 @@ async def update_patient_service(
     Update info on a patient
     """
 
-    epd_url = url_prefix
-    params = {"id": patient_id}
-    payload = form_data.model_dump(by_alias=True)
+    patient = await _update_patient(
+        patient_id=patient_id, form_data=form_data, token=token
+    )
+    await _patients_changed(EventActionEnum.UPDATED, [patient.id])
+    return patient
+
+
+async def create_patients_bulk_service(
+    items: list[PatientResponse], token: str
+) -> BulkResponse:
+    """
+    Create several patients, a few at a time, with a status per item.
+    The cache is invalidated and the change published once for the batch.
+    """
+
+    async def create(item: PatientResponse) -> PatientDetailResponse:
+        return await _create_patient(form_data=item, token=token)
+
+    results = await run_bounded(
+        items, create, concurrency=get_settings().batch_concurrency
+    )
+    await _patients_changed(EventActionEnum.CREATED, succeeded_ids(results))
+    return summarize_bulk(results, success_status=status.HTTP_201_CREATED)
+
 
-    try:
-        async with httpx.AsyncClient() as client:
-            response = await client.put(
-                epd_url, params=params, json=payload, headers=create_header(token)
-            )
-            response.raise_for_status()
-    except httpx.RequestError as exc:
-        raise HTTPException(
-            status_code=status.HTTP_502_BAD_GATEWAY, detail="EPD niet bereikbaar"
-        ) from exc
-    except httpx.HTTPStatusError as exc:
-        raise HTTPException(
-            status_code=exc.response.status_code,
-            detail=exc.response.text,
-        ) from exc
-
-    data = response.json()
-    return PatientDetailResponse.model_validate(data)
+async def update_patients_bulk_service(
+    items: list[PatientResponse], token: str
+) -> BulkResponse:
+    """
+    Update several patients by their id, a few at a time, with a status
+    per item. The cache is invalidated and the change published once for the
+    batch.
+    """
+
+    async def update(item: PatientResponse) -> PatientDetailResponse:
+        return await _update_patient(patient_id=item.id, form_data=item, token=token)
+
+    results = await run_bounded(
+        items, update, concurrency=get_settings().batch_concurrency
+    )
+    await _patients_changed(EventActionEnum.UPDATED, succeeded_ids(results))
+    return summarize_bulk(results, success_status=status.HTTP_200_OK)
 
 
 async def delete_patient_service(patient_id: int, token: str) -> None:
     """
     Delete a patient
     """
-    epd_url = url_prefix
     params = {"id": patient_id}
 
-    try:
-        async with httpx.AsyncClient() as client:
-            response = await client.delete(
-                epd_url, params=params, headers=create_header(token)
-            )
-            response.raise_for_status()
-    except httpx.RequestError as exc:
-        raise HTTPException(
-            status_code=status.HTTP_502_BAD_GATEWAY, detail="EPD niet bereikbaar"
-        ) from exc
-    except httpx.HTTPStatusError as exc:
-        raise HTTPException(
-            status_code=exc.response.status_code,
-            detail=exc.response.text,
-        ) from exc
+    await call_upstream(
+        EPD,
+        "DELETE",
+        url_prefix,
+        token,
+        operation="delete_patient_service",
+        params=params,
+    )
+    await _patients_changed(EventActionEnum.DELETED, [patient_id])
+
+
+async def _create_patient(
+    form_data: PatientResponse, token: str
+) -> PatientDetailResponse:
+    payload = form_data.model_dump(by_alias=True)
+    return await call_upstream(
+        EPD,
+        "POST",
+        url_prefix,
+        token,
+        operation="create_patient_service",
+        body=payload,
+        response_model=PatientDetailResponse,
+    )
+
+
+async def _update_patient(
+    patient_id: int, form_data: PatientResponse, token: str
+) -> PatientDetailResponse:
+    params = {"id": patient_id}
+    payload = form_data.model_dump(by_alias=True)
+    return await call_upstream(
+        EPD,
+        "PUT",
+        url_prefix,
+        token,
+        operation="update_patient_service",
+        params=params,
+        body=payload,
+        response_model=PatientDetailResponse,
+    )
+
+
+async def _patients_changed(action: EventActionEnum, patient_ids: list[int]) -> None:
+    """
+    Invalidate the cached patients and encounters and publish one event for
+    the changed patients, nothing when none changed
+    """
+    if not patient_ids:
+        return
+    await response_cache.invalidate(PATIENTS, ENCOUNTERS)
+    ids = [str(patient_id) for patient_id in patient_ids]
+    if len(ids) == 1:
+        event = EventOut(topic=EventTopicEnum.PATIENTS, action=action, id=ids[0])
+    else:
+        event = EventOut(topic=EventTopicEnum.PATIENTS, action=action, ids=ids)
+    event_broker.publish(event)
@@ -0,0 +1,66 @@
+import time
+from contextvars import ContextVar
+
+# Entries kept per request, a bulk write would otherwise produce a header
+# with an entry for every item
+MAX_ENTRIES = 32
+
+
+class ServerTiming:
+    """
+    Durations of the phases of one request, sent back in the
+    `Server-Timing` header
+    """
+
+    def __init__(self) -> None:
+        """
+        Start timing a request
+        """
+        self.started = time.perf_counter()
+        self.entries: list[tuple[str, float, str | None]] = []
+        self.dropped = 0
+
+    def add(self, name: str, seconds: float, description: str | None = None) -> None:
+        """
+        Record a phase, `name` must be an HTTP token
+        """
+        if len(self.entries) >= MAX_ENTRIES:
+            self.dropped += 1
+            return
+        self.entries.append((name, seconds, description))
+
+    def header(self) -> str:
+        """
+        Value of the `Server-Timing` header, ending with the total so far
+        """
+        parts = [
+            _metric(name, seconds, description)
+            for name, seconds, description in self.entries
+        ]
+        if self.dropped:
+            parts.append(f'dropped;desc="{self.dropped} more entries"')
+        parts.append(_metric("total", time.perf_counter() - self.started, None))
+        return ", ".join(parts)
+
+
+def _metric(name: str, seconds: float, description: str | None) -> str:
+    metric = name
+    if description is not None:
+        escaped = description.replace("\\", "\\\\").replace('"', '\\"')
+        metric += f';desc="{escaped}"'
+    return f"{metric};dur={seconds * 1000:.1f}"
+
+
+# Timing of the request that is handled, None outside of a request
+current_timing: ContextVar[ServerTiming | None] = ContextVar(
+    "current_timing", default=None
+)
+
+
+def record_timing(name: str, seconds: float, description: str | None = None) -> None:
+    """
+    Add a phase to the Server-Timing of the current request, if any
+    """
+    timing = current_timing.get()
+    if timing is not None:
+        timing.add(name, seconds, description)
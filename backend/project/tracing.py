@@ -0,0 +1,249 @@
+import asyncio
+import logging
+import random
+import re
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Iterator
+
+import httpx
+
+from project.config import get_settings
+from project.upstream.clients import OTLP, upstream_clients
+
+logger = logging.getLogger(__name__)
+
+# OTLP span kinds
+INTERNAL = 1
+SERVER = 2
+CLIENT = 3
+
+TRACEPARENT_RE = re.compile(
+    r"^00-(?P<trace_id>[0-9a-f]{32})-(?P<span_id>[0-9a-f]{16})-(?P<flags>[0-9a-f]{2})$"
+)
+
+
+@dataclass
+class Span:
+    """
+    Timed operation of a trace, ids are lowercase hex as in `traceparent`
+    """
+
+    name: str
+    trace_id: str
+    span_id: str
+    parent_id: str | None
+    kind: int
+    sampled: bool
+    start_ns: int = field(default_factory=time.time_ns)
+    end_ns: int = 0
+    attributes: dict[str, str | int | float | bool] = field(default_factory=dict)
+    error: bool = False
+
+    @property
+    def traceparent(self) -> str:
+        """
+        W3C `traceparent` header that makes this span the parent of the callee
+        """
+        flags = "01" if self.sampled else "00"
+        return f"00-{self.trace_id}-{self.span_id}-{flags}"
+
+
+def _new_id(bits: int) -> str:
+    return f"{random.getrandbits(bits):0{bits // 4}x}"
+
+
+def parse_traceparent(header: str | None) -> tuple[str, str, bool] | None:
+    """
+    Trace id, parent span id and sampled flag of a `traceparent` header,
+    None when it is missing or invalid
+    """
+    if header is None:
+        return None
+    match = TRACEPARENT_RE.match(header.strip().lower())
+    if match is None or set(match["trace_id"]) == {"0"}:
+        return None
+    if set(match["span_id"]) == {"0"}:
+        return None
+    return match["trace_id"], match["span_id"], bool(int(match["flags"], 16) & 1)
+
+
+# Span of the operation that is running, None outside of a request
+current_span: ContextVar[Span | None] = ContextVar("current_span", default=None)
+
+
+def start_server_span(name: str, traceparent: str | None) -> Span:
+    """
+    Root span of an incoming request, continuing the trace of the caller when
+    it sent a valid `traceparent`
+    """
+    parent = parse_traceparent(traceparent)
+    if parent is None:
+        sampled = random.random() < get_settings().tracing_sample_ratio
+        return Span(name, _new_id(128), _new_id(64), None, SERVER, sampled)
+    trace_id, parent_id, sampled = parent
+    return Span(name, trace_id, _new_id(64), parent_id, SERVER, sampled)
+
+
+@contextmanager
+def start_span(
+    name: str, kind: int = INTERNAL, **attributes: str | int | float | bool
+) -> Iterator[Span | None]:
+    """
+    Child span of the current span for the duration of the block, nothing is
+    recorded outside of a traced request
+    """
+    parent = current_span.get()
+    if parent is None:
+        yield None
+        return
+
+    span = Span(
+        name,
+        parent.trace_id,
+        _new_id(64),
+        parent.span_id,
+        kind,
+        parent.sampled,
+        attributes=dict(attributes),
+    )
+    token = current_span.set(span)
+    try:
+        yield span
+    except BaseException:
+        span.error = True
+        raise
+    finally:
+        current_span.reset(token)
+        end_span(span)
+
+
+def end_span(span: Span) -> None:
+    """
+    Close a span and queue it for export when its trace is sampled
+    """
+    span.end_ns = time.time_ns()
+    if span.sampled:
+        span_exporter.add(span)
+
+
+def _attribute(key: str, value: str | int | float | bool) -> dict[str, Any]:
+    if isinstance(value, bool):
+        return {"key": key, "value": {"boolValue": value}}
+    if isinstance(value, int):
+        return {"key": key, "value": {"intValue": str(value)}}
+    if isinstance(value, float):
+        return {"key": key, "value": {"doubleValue": value}}
+    return {"key": key, "value": {"stringValue": value}}
+
+
+def _encode_span(span: Span) -> dict[str, Any]:
+    encoded: dict[str, Any] = {
+        "traceId": span.trace_id,
+        "spanId": span.span_id,
+        "name": span.name,
+        "kind": span.kind,
+        "startTimeUnixNano": str(span.start_ns),
+        "endTimeUnixNano": str(span.end_ns),
+        "attributes": [
+            _attribute(key, value) for key, value in span.attributes.items()
+        ],
+        "status": {"code": 2 if span.error else 0},
+    }
+    if span.parent_id is not None:
+        encoded["parentSpanId"] = span.parent_id
+    return encoded
+
+
+class SpanExporter:
+    """
+    Buffers finished spans and sends them in batches to an OTLP/HTTP
+    collector (JSON encoding). When the buffer is full the oldest spans are
+    dropped, exporting never slows down a request.
+    """
+
+    def __init__(self, service_name: str, max_queue: int, batch_size: int) -> None:
+        """
+        Args:
+            service_name: `service.name` resource attribute of the spans
+            max_queue: finished spans kept while waiting for export
+            batch_size: spans sent per export request
+        """
+        self.service_name = service_name
+        self.batch_size = batch_size
+        self._spans: deque[Span] = deque(maxlen=max_queue)
+        self._task: asyncio.Task[None] | None = None
+        self.exported = 0
+        self.failed = 0
+
+    @property
+    def enabled(self) -> bool:
+        """
+        Whether spans are exported, only after `start`
+        """
+        return self._task is not None
+
+    def add(self, span: Span) -> None:
+        """
+        Queue a finished span
+        """
+        if self.enabled:
+            self._spans.append(span)
+
+    def start(self, interval: float) -> None:
+        """
+        Export the queued spans every `interval` seconds
+        """
+        self._task = asyncio.create_task(self._export_loop(interval))
+
+    async def aclose(self) -> None:
+        """
+        Stop the background export and send what is left
+        """
+        task, self._task = self._task, None
+        if task is None:
+            return
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        await self.flush()
+
+    async def flush(self) -> None:
+        """
+        Send all queued spans
+        """
+        while self._spans:
+            count = min(len(self._spans), self.batch_size)
+            batch = [self._spans.popleft() for _ in range(count)]
+            try:
+                response = await upstream_clients.get(OTLP).post(
+                    "/v1/traces", json=self._encode(batch)
+                )
+                response.raise_for_status()
+            except httpx.HTTPError:
+                self.failed += len(batch)
+                logger.warning("Exporting %d spans failed", len(batch), exc_info=True)
+                return
+            self.exported += len(batch)
+
+    def _encode(self, spans: list[Span]) -> dict[str, Any]:
+        resource = {"attributes": [_attribute("service.name", self.service_name)]}
+        scope_spans = {
+            "scope": {"name": __name__},
+            "spans": [_encode_span(span) for span in spans],
+        }
+        return {"resourceSpans": [{"resource": resource, "scopeSpans": [scope_spans]}]}
+
+    async def _export_loop(self, interval: float) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            await self.flush()
+
+
+span_exporter = SpanExporter(
+    service_name=get_settings().tracing_service_name,
+    max_queue=get_settings().tracing_max_queue,
+    batch_size=get_settings().tracing_batch_size,
+)
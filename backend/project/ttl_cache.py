@@ -0,0 +1,151 @@
+import time
+from collections import OrderedDict
+from typing import Callable, Generic, TypeVar
+
+V = TypeVar("V")
+
+
+class TTLCache(Generic[V]):
+    """
+    In-process LRU cache where every entry has its own time to live.
+    When full, the least recently used entry is evicted.
+    """
+
+    def __init__(
+        self,
+        max_size: int,
+        clock: Callable[[], float] = time.monotonic,
+        max_weight: int | None = None,
+        weigh: Callable[[V], int] | None = None,
+    ) -> None:
+        """
+        Args:
+            max_size: maximum amount of entries kept in the cache
+            clock: monotonic clock used for the expiry of entries
+            max_weight: maximum total weight of the entries, e.g. their size
+                in bytes, None for no limit
+            weigh: weight of a value, required with `max_weight`
+        """
+        if max_weight is not None and weigh is None:
+            raise ValueError("A weight limit needs a weigh function")
+        self.max_size = max_size
+        self.max_weight = max_weight
+        self._clock = clock
+        self._weigh = weigh
+        self._entries: OrderedDict[str, tuple[float, V]] = OrderedDict()
+        self.weight = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        """
+        Amount of entries, including expired ones that were not evicted yet
+        """
+        return len(self._entries)
+
+    def get(self, key: str) -> V | None:
+        """
+        Get a live entry and mark it as recently used
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        expires_at, value = entry
+        if expires_at <= self._clock():
+            self.delete(key)
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def peek(self, key: str) -> V | None:
+        """
+        Get a live entry without touching its recency or the counters
+        """
+        entry = self._entries.get(key)
+        if entry is None or entry[0] <= self._clock():
+            return None
+        return entry[1]
+
+    def set(self, key: str, value: V, ttl: float) -> None:
+        """
+        Store an entry for `ttl` seconds, entries without a positive ttl or
+        heavier than the whole weight limit are skipped
+        """
+        if ttl <= 0 or self.max_size <= 0:
+            return
+        weight = self._weight_of(value)
+        if self.max_weight is not None and weight > self.max_weight:
+            self.delete(key)
+            return
+
+        self.delete(key)
+        self._entries[key] = (self._clock() + ttl, value)
+        self.weight += weight
+        self._evict(keep=key)
+
+    def replace(self, key: str, value: V) -> None:
+        """
+        Replace the value of a live entry, keeping its expiry.
+        Missing or expired entries are left out, an entry whose new value is
+        heavier than the whole weight limit is removed.
+        """
+        entry = self._entries.get(key)
+        if entry is None or entry[0] <= self._clock():
+            return
+        weight = self._weight_of(value)
+        if self.max_weight is not None and weight > self.max_weight:
+            self.delete(key)
+            return
+
+        self.weight += weight - self._weight_of(entry[1])
+        self._entries[key] = (entry[0], value)
+        self._evict(keep=key)
+
+    def delete(self, key: str) -> None:
+        """
+        Remove an entry if present
+        """
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.weight -= self._weight_of(entry[1])
+
+    def clear(self) -> None:
+        """
+        Remove all entries
+        """
+        self._entries.clear()
+        self.weight = 0
+
+    def stats(self) -> dict[str, int]:
+        """
+        Counters of the cache, for monitoring
+        """
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+    def _over_limits(self) -> bool:
+        return len(self._entries) > self.max_size or (
+            self.max_weight is not None and self.weight > self.max_weight
+        )
+
+    def _evict(self, keep: str) -> None:
+        # Least recently used first, `keep` is the entry that was just written
+        for key in list(self._entries):
+            if not self._over_limits():
+                return
+            if key != keep:
+                self.delete(key)
+                self.evictions += 1
+
+    def _weight_of(self, value: V) -> int:
+        return self._weigh(value) if self._weigh is not None else 0
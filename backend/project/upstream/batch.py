@@ -0,0 +1,54 @@
+import asyncio
+from typing import Awaitable, Callable, TypeVar
+
+from fastapi import HTTPException
+
+ItemT = TypeVar("ItemT")
+T = TypeVar("T")
+
+
+async def run_bounded(
+    items: list[ItemT],
+    call: Callable[[ItemT], Awaitable[T]],
+    concurrency: int,
+) -> list[T | HTTPException]:
+    """
+    Call `call` for every item with at most `concurrency` calls running at once.
+
+    Returns:
+        the result or the HTTPException of every item, in the order of `items`
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def call_one(item: ItemT) -> T | HTTPException:
+        async with semaphore:
+            try:
+                return await call(item)
+            except HTTPException as exc:
+                return exc
+
+    return await asyncio.gather(*(call_one(item) for item in items))
+
+
+async def fetch_many(
+    ids: list[int],
+    fetch: Callable[[int], Awaitable[T]],
+    concurrency: int,
+) -> tuple[dict[int, T], dict[int, str]]:
+    """
+    Fetch every distinct id with at most `concurrency` calls running at once.
+
+    Returns:
+        the results and the errors of the failed ids, both keyed by id
+    """
+    unique_ids = list(dict.fromkeys(ids))
+    results = await run_bounded(unique_ids, fetch, concurrency)
+
+    items: dict[int, T] = {}
+    errors: dict[int, str] = {}
+    for item_id, result in zip(unique_ids, results, strict=True):
+        if isinstance(result, HTTPException):
+            errors[item_id] = str(result.detail)
+        else:
+            items[item_id] = result
+    return items, errors
@@ -0,0 +1,274 @@
+import hashlib
+import json
+from typing import Any, Protocol
+
+from project.config import get_settings
+from project.ttl_cache import TTLCache
+
+# Patient charts embed their encounters and encounter details embed the
+# patient, so a change to either invalidates both
+PATIENTS = "patients"
+ENCOUNTERS = "encounters"
+
+
+class CacheBackend(Protocol):
+    """
+    Storage of the response cache. The operations are a subset of Redis,
+    so a `redis.asyncio.Redis` client (or a local stand-in) can be plugged in.
+    """
+
+    async def get(self, key: str) -> bytes | None:
+        """
+        Get a live entry or the value of a counter, None when missing
+        """
+
+    async def set(self, key: str, value: bytes, ttl: float) -> None:
+        """
+        Store an entry for `ttl` seconds
+        """
+
+    async def incr(self, key: str) -> int:
+        """
+        Increment a counter, starting at 0, and return its new value
+        """
+
+    async def aclose(self) -> None:
+        """
+        Release the storage
+        """
+
+
+class MemoryCacheBackend:
+    """
+    In-process LRU backend, the default
+    """
+
+    def __init__(self, max_size: int) -> None:
+        """
+        Args:
+            max_size: maximum amount of cached responses
+        """
+        self.entries: TTLCache[bytes] = TTLCache(max_size=max_size)
+        # Kept apart from the entries, so LRU eviction can't reset them
+        self._counters: dict[str, int] = {}
+
+    async def get(self, key: str) -> bytes | None:
+        """
+        Get a live entry or the value of a counter
+        """
+        if key in self._counters:
+            return str(self._counters[key]).encode()
+        return self.entries.get(key)
+
+    async def set(self, key: str, value: bytes, ttl: float) -> None:
+        """
+        Store an entry for `ttl` seconds
+        """
+        self.entries.set(key, value, ttl=ttl)
+
+    async def incr(self, key: str) -> int:
+        """
+        Increment a counter and return its new value
+        """
+        self._counters[key] = self._counters.get(key, 0) + 1
+        return self._counters[key]
+
+    async def aclose(self) -> None:
+        """
+        Drop all entries
+        """
+        self.entries.clear()
+        self._counters.clear()
+
+
+class RedisClient(Protocol):
+    """
+    Commands of `redis.asyncio.Redis` used by the redis backend
+    """
+
+    async def get(self, name: str) -> bytes | None:
+        """
+        Value of a key, None when missing
+        """
+
+    async def set(self, name: str, value: bytes, px: int) -> bool | None:
+        """
+        Store a value that expires after `px` milliseconds
+        """
+
+    async def incr(self, name: str) -> int:
+        """
+        Increment the integer value of a key
+        """
+
+    async def aclose(self) -> None:
+        """
+        Close the connection
+        """
+
+
+class RedisCacheBackend:
+    """
+    Backend on a Redis compatible async client
+    """
+
+    def __init__(self, client: RedisClient) -> None:
+        """
+        Args:
+            client: `redis.asyncio.Redis` client or a compatible one
+        """
+        self.client = client
+
+    async def get(self, key: str) -> bytes | None:
+        """
+        Get a live entry
+        """
+        return await self.client.get(key)
+
+    async def set(self, key: str, value: bytes, ttl: float) -> None:
+        """
+        Store an entry for `ttl` seconds
+        """
+        await self.client.set(key, value, px=max(int(ttl * 1000), 1))
+
+    async def incr(self, key: str) -> int:
+        """
+        Increment a counter and return its new value
+        """
+        return await self.client.incr(key)
+
+    async def aclose(self) -> None:
+        """
+        Close the connection of the client
+        """
+        await self.client.aclose()
+
+
+def request_digest(upstream: str, path: str, params: dict[str, Any], scope: str) -> str:
+    """
+    Hash identifying an upstream GET request of a caller scope
+    """
+    request = json.dumps([upstream, path, sorted(params.items()), scope], default=str)
+    return hashlib.sha256(request.encode()).hexdigest()
+
+
+def build_cache_backend() -> CacheBackend | None:
+    """
+    Create the backend selected in the settings, None when caching is off.
+    The redis backend requires the `redis` package.
+    """
+    settings = get_settings()
+    if settings.response_cache_backend == "none":
+        return None
+    if settings.response_cache_backend == "redis":
+        from redis.asyncio import Redis
+
+        return RedisCacheBackend(Redis.from_url(settings.redis_url))
+    return MemoryCacheBackend(max_size=settings.response_cache_max_size)
+
+
+def get_resource_ttls() -> dict[str, float]:
+    """
+    Time to live of the cached responses of every resource
+    """
+    settings = get_settings()
+    return {
+        PATIENTS: settings.patients_cache_ttl,
+        ENCOUNTERS: settings.encounters_cache_ttl,
+    }
+
+
+class ResponseCache:
+    """
+    Read-through cache of upstream GET responses.
+    Entries are grouped per resource, invalidating a resource bumps its
+    generation, which is part of the key, so old entries are never read again
+    and expire on their own.
+    """
+
+    def __init__(self) -> None:
+        """
+        Create a disabled cache, the backend is plugged in by `start`
+        """
+        self.backend: CacheBackend | None = None
+        self.ttls: dict[str, float] = {}
+
+    def start(self, backend: CacheBackend | None, ttls: dict[str, float]) -> None:
+        """
+        Enable the cache on `backend`, None leaves it disabled
+        """
+        self.backend = backend
+        self.ttls = ttls
+
+    async def aclose(self) -> None:
+        """
+        Disable the cache and close its backend
+        """
+        backend, self.backend = self.backend, None
+        if backend is not None:
+            await backend.aclose()
+
+    async def key(
+        self,
+        resource: str,
+        upstream: str,
+        path: str,
+        params: dict[str, Any],
+        scope: str,
+    ) -> str:
+        """
+        Key of a response, covering the resource generation, the request and
+        the authorization scope of the caller
+        """
+        generation = await self._get_backend().get(self._generation_key(resource))
+        digest = request_digest(upstream, path, params, scope)
+        return f"{resource}:{int(generation or 0)}:{digest}"
+
+    def enabled_for(self, resource: str) -> bool:
+        """
+        Whether responses of `resource` are cached
+        """
+        return self.backend is not None and self.ttls.get(resource, 0) > 0
+
+    async def get(self, key: str) -> bytes | None:
+        """
+        Get a cached response body
+        """
+        return await self._get_backend().get(key)
+
+    async def set(self, resource: str, key: str, content: bytes) -> None:
+        """
+        Store a response body for the ttl of its resource
+        """
+        await self._get_backend().set(key, content, ttl=self.ttls[resource])
+
+    async def invalidate(self, *resources: str) -> None:
+        """
+        Drop the cached responses of `resources`
+        """
+        if self.backend is None:
+            return
+        for resource in resources:
+            await self.backend.incr(self._generation_key(resource))
+
+    def _get_backend(self) -> CacheBackend:
+        if self.backend is None:
+            raise RuntimeError("Response cache is not started")
+        return self.backend
+
+    @staticmethod
+    def _generation_key(resource: str) -> str:
+        return f"{resource}:generation"
+
+
+response_cache = ResponseCache()
+
+# ETag and body of the last upstream response per request, used to revalidate
+# with If-None-Match once the response cache expired. A 304 of the upstream
+# confirms the body, so invalidation of the resource is not needed here.
+# Large list pages would crowd out the rest, so the bodies share a byte budget.
+upstream_validators: TTLCache[tuple[str, bytes]] = TTLCache(
+    max_size=get_settings().upstream_validators_max_size,
+    max_weight=get_settings().upstream_validators_max_bytes,
+    weigh=lambda validator: len(validator[0]) + len(validator[1]),
+)
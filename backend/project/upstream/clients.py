@@ -0,0 +1,187 @@
+import logging
+from dataclasses import dataclass
+from functools import lru_cache
+
+import httpx
+
+from project.config import get_settings
+from project.globals import EPD_URL, MAIL_URL
+
+logger = logging.getLogger(__name__)
+
+EPD = "epd"
+MAIL = "mail"
+AUTH0 = "auth0"
+OTLP = "otlp"
+
+
+@dataclass(frozen=True)
+class UpstreamConfig:
+    name: str
+    base_url: str
+    max_connections: int
+    max_keepalive_connections: int
+    keepalive_expiry: float
+    connect_timeout: float
+    read_timeout: float
+    pool_timeout: float
+    http2: bool = False
+
+    def build_client(self) -> httpx.AsyncClient:
+        """
+        Create a pooled client for this upstream with its timeouts.
+        Enabling http2 requires the `h2` package (httpx[http2]).
+        """
+        return httpx.AsyncClient(
+            base_url=self.base_url,
+            limits=httpx.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=self.max_keepalive_connections,
+                keepalive_expiry=self.keepalive_expiry,
+            ),
+            timeout=httpx.Timeout(
+                self.read_timeout,
+                connect=self.connect_timeout,
+                pool=self.pool_timeout,
+            ),
+            http2=self.http2,
+        )
+
+
+def get_upstream_configs() -> list[UpstreamConfig]:
+    """
+    Build the pool configuration of every upstream from the settings,
+    the trace collector is only included when `otlp_endpoint` is set
+    """
+    settings = get_settings()
+    configs = [
+        UpstreamConfig(
+            name=EPD,
+            base_url=str(EPD_URL),
+            max_connections=settings.epd_max_connections,
+            max_keepalive_connections=settings.epd_max_keepalive_connections,
+            keepalive_expiry=settings.epd_keepalive_expiry,
+            connect_timeout=settings.epd_connect_timeout,
+            read_timeout=settings.epd_read_timeout,
+            pool_timeout=settings.epd_pool_timeout,
+            http2=settings.epd_http2,
+        ),
+        UpstreamConfig(
+            name=MAIL,
+            base_url=str(MAIL_URL),
+            max_connections=settings.mail_max_connections,
+            max_keepalive_connections=settings.mail_max_keepalive_connections,
+            keepalive_expiry=settings.mail_keepalive_expiry,
+            connect_timeout=settings.mail_connect_timeout,
+            read_timeout=settings.mail_read_timeout,
+            pool_timeout=settings.mail_pool_timeout,
+            http2=settings.mail_http2,
+        ),
+        UpstreamConfig(
+            name=AUTH0,
+            base_url=f"https://{settings.auth0_domain}",
+            max_connections=settings.auth0_max_connections,
+            max_keepalive_connections=settings.auth0_max_keepalive_connections,
+            keepalive_expiry=settings.auth0_keepalive_expiry,
+            connect_timeout=settings.auth0_connect_timeout,
+            read_timeout=settings.auth0_read_timeout,
+            pool_timeout=settings.auth0_pool_timeout,
+        ),
+    ]
+    if settings.otlp_endpoint is not None:
+        configs.append(
+            UpstreamConfig(
+                name=OTLP,
+                base_url=settings.otlp_endpoint,
+                max_connections=2,
+                max_keepalive_connections=1,
+                keepalive_expiry=30.0,
+                connect_timeout=2.0,
+                read_timeout=5.0,
+                pool_timeout=5.0,
+            )
+        )
+    return configs
+
+
+class UpstreamClients:
+    """
+    One long-lived, pooled httpx client per upstream service.
+    Opened and closed by the app lifespan, shared by all services.
+    """
+
+    def __init__(self) -> None:
+        """
+        Create an empty registry, clients are opened by `start`
+        """
+        self._clients: dict[str, httpx.AsyncClient] = {}
+
+    def start(self, configs: list[UpstreamConfig]) -> None:
+        """
+        Open a pooled client for every configured upstream
+        """
+        for config in configs:
+            self._clients[config.name] = config.build_client()
+
+    async def aclose(self) -> None:
+        """
+        Close all clients and release their pooled connections
+        """
+        clients, self._clients = self._clients, {}
+        for client in clients.values():
+            await client.aclose()
+
+    def pool_stats(self) -> dict[str, dict[str, int]]:
+        """
+        Connections of the pool of every client, for monitoring.
+        Clients whose pool can't be read are left out, see `_read_pool`.
+        """
+        stats = {}
+        for name, client in self._clients.items():
+            pool = _read_pool(client)
+            if pool is not None:
+                stats[name] = pool
+        return stats
+
+    def get(self, name: str) -> httpx.AsyncClient:
+        """
+        Get the shared client of an upstream
+        """
+        try:
+            return self._clients[name]
+        except KeyError:
+            raise RuntimeError(f"Upstream client '{name}' is not started") from None
+
+
+def _read_pool(client: httpx.AsyncClient) -> dict[str, int] | None:
+    """
+    Connections of the httpcore pool behind the default transport of a client.
+    httpx has no public API for them, so this reads its private attributes and
+    returns None when they are missing, e.g. after an httpx / httpcore upgrade
+    or with a custom transport.
+    """
+    try:
+        pool = client._transport._pool
+        connections = pool.connections
+        idle = sum(1 for connection in connections if connection.is_idle())
+        return {
+            "active": len(connections) - idle,
+            "idle": idle,
+            "max": pool._max_connections,
+            "queued": sum(1 for request in pool._requests if request.is_queued()),
+        }
+    except AttributeError:
+        _warn_unreadable_pool(type(client._transport).__name__)
+        return None
+
+
+@lru_cache
+def _warn_unreadable_pool(transport: str) -> None:
+    # Once per transport type, pool_stats runs on every metrics scrape
+    logger.warning(
+        "Connection pool of %s can't be read, it is left out of the metrics",
+        transport,
+    )
+
+
+upstream_clients = UpstreamClients()
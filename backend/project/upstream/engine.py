@@ -0,0 +1,389 @@
+import asyncio
+import math
+import time
+from enum import Enum
+from typing import Any, AsyncIterator, Awaitable, Callable, TypeVar, overload
+
+import httpx
+from fastapi import HTTPException, status
+from pydantic import BaseModel
+
+from project.config import get_settings
+from project.metrics import (
+    response_cache_requests,
+    upstream_decode_duration,
+    upstream_request_duration,
+)
+from project.services.auth_service import (
+    create_header,
+    get_token_fingerprint,
+    get_token_scope,
+)
+from project.timing import record_timing
+from project.tracing import CLIENT, start_span
+from project.upstream.cache import (
+    request_digest,
+    response_cache,
+    upstream_validators,
+)
+from project.upstream.clients import EPD, MAIL, upstream_clients
+from project.upstream.limiter import (
+    LimitExceededError,
+    request_priority,
+    upstream_limiters,
+)
+from project.upstream.resilience import (
+    RETRYABLE_STATUSES,
+    CircuitOpenError,
+    upstream_guards,
+)
+
+ModelT = TypeVar("ModelT", bound=BaseModel)
+JSONBody = dict[str, Any] | list[Any]
+
+# Running GET requests, shared by identical concurrent calls
+_inflight: dict[str, asyncio.Future[Any]] = {}
+
+UNREACHABLE_DETAILS = {
+    EPD: "EPD niet bereikbaar",
+    MAIL: "Mail service niet bereikbaar",
+}
+
+
+def _unreachable(upstream: str) -> str:
+    return UNREACHABLE_DETAILS.get(upstream, f"{upstream} niet bereikbaar")
+
+
+def _unavailable(exc: CircuitOpenError | LimitExceededError) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail=_unreachable(exc.upstream),
+        headers={"Retry-After": str(max(math.ceil(exc.retry_after), 1))},
+    )
+
+
+async def _guarded(
+    upstream: str,
+    send: Callable[[dict[str, str]], Awaitable[httpx.Response]],
+    idempotent: bool,
+    operation: str,
+) -> httpx.Response:
+    limiter = upstream_limiters.get(upstream)
+    guard = upstream_guards.get(upstream)
+
+    async def timed() -> httpx.Response:
+        started = time.perf_counter()
+        outcome = "error"
+        with start_span(
+            f"{upstream} {operation}", CLIENT, **{"code.function": operation}
+        ) as span:
+            trace_headers = {} if span is None else {"traceparent": span.traceparent}
+            try:
+                response = await send(trace_headers)
+                outcome = str(response.status_code)
+                if span is not None:
+                    span.attributes["http.response.status_code"] = response.status_code
+                    span.error = response.status_code >= 500
+                return response
+            finally:
+                elapsed = time.perf_counter() - started
+                upstream_request_duration.observe(elapsed, upstream, operation, outcome)
+                record_timing(upstream, elapsed, operation)
+
+    async def limited() -> httpx.Response:
+        # Every attempt takes its own slot, streamed bodies free it once the
+        # headers are in
+        if limiter is None:
+            return await timed()
+        await limiter.acquire(request_priority.get())
+        started = time.monotonic()
+        overloaded = True
+        try:
+            response = await timed()
+            overloaded = response.status_code in RETRYABLE_STATUSES
+            return response
+        finally:
+            limiter.release(time.monotonic() - started, overloaded=overloaded)
+
+    if guard is None:
+        return await limited()
+    return await guard.call(limited, idempotent=idempotent)
+
+
+def clean_params(params: dict[str, Any] | None) -> dict[str, Any]:
+    """
+    Drop unset query params and send enums by their value
+    """
+    if not params:
+        return {}
+    return {
+        key: value.value if isinstance(value, Enum) else value
+        for key, value in params.items()
+        if value is not None
+    }
+
+
+@overload
+async def call_upstream(
+    upstream: str,
+    method: str,
+    path: str,
+    token: str,
+    *,
+    operation: str,
+    params: dict[str, Any] | None = None,
+    body: JSONBody | None = None,
+    response_model: type[ModelT],
+    cache_resource: str | None = None,
+) -> ModelT: ...
+
+
+@overload
+async def call_upstream(
+    upstream: str,
+    method: str,
+    path: str,
+    token: str,
+    *,
+    operation: str,
+    params: dict[str, Any] | None = None,
+    body: JSONBody | None = None,
+    response_model: None = None,
+    cache_resource: str | None = None,
+) -> None: ...
+
+
+async def call_upstream(
+    upstream: str,
+    method: str,
+    path: str,
+    token: str,
+    *,
+    operation: str,
+    params: dict[str, Any] | None = None,
+    body: JSONBody | None = None,
+    response_model: type[ModelT] | None = None,
+    cache_resource: str | None = None,
+) -> ModelT | None:
+    """
+    Send a request to an upstream service and validate the answer.
+
+    Concurrent identical GETs share one upstream request and its validated
+    result. They are matched per authorization scope for cacheable resources
+    and per token otherwise.
+
+    Args:
+        upstream: name of the upstream client (EPD / MAIL)
+        method: HTTP method
+        path: path relative to the upstream base url
+        token: bearer token that is forwarded to the upstream
+        operation: name of the calling service operation, the label of its
+            metrics, timings and spans
+        params: query params, unset (None) values are left out
+        body: JSON body
+        response_model: model the response is validated into, None to ignore it
+        cache_resource: resource a GET response is cached under, see
+            `response_cache`, None to always ask the upstream. Such GETs are
+            also revalidated with the upstream ETag when it sends one.
+
+    GETs are retried on connection errors, timeouts and 502/503/504 answers
+    within the retry budget of the upstream, see `upstream_guards`. Calls
+    beyond the concurrency limit of the upstream wait for a slot by the
+    priority of the request, see `upstream_limiters`.
+
+    Raises:
+        HTTPException: 502 when the upstream is unreachable, 503 while its
+            circuit breaker is open or the call is shed, otherwise the
+            status code and body of the failed upstream response
+    """
+    query = clean_params(params)
+    if method != "GET":
+        return await _send(
+            upstream,
+            method,
+            path,
+            token,
+            query,
+            body,
+            response_model,
+            None,
+            None,
+            operation,
+        )
+
+    # Identical concurrent GETs of the same caller scope share one request
+    if cache_resource is not None:
+        scope = get_token_scope(token)
+    else:
+        scope = get_token_fingerprint(token)
+    model_name = response_model.__qualname__ if response_model else ""
+    flight_key = f"{request_digest(upstream, path, query, scope)}:{model_name}"
+
+    flight = _inflight.get(flight_key)
+    if flight is None:
+        flight = asyncio.ensure_future(
+            _send(
+                upstream,
+                method,
+                path,
+                token,
+                query,
+                body,
+                response_model,
+                cache_resource,
+                scope,
+                operation,
+            )
+        )
+        _inflight[flight_key] = flight
+        flight.add_done_callback(lambda _: _inflight.pop(flight_key, None))
+    return await asyncio.shield(flight)
+
+
+async def _send(
+    upstream: str,
+    method: str,
+    path: str,
+    token: str,
+    query: dict[str, Any],
+    body: JSONBody | None,
+    response_model: type[ModelT] | None,
+    cache_resource: str | None,
+    scope: str | None,
+    operation: str,
+) -> ModelT | None:
+    client = upstream_clients.get(upstream)
+    headers = create_header(token)
+
+    cache_key = None
+    validator_key = None
+    validator = None
+    if cache_resource is not None and scope is not None:
+        if response_cache.enabled_for(cache_resource):
+            cache_key = await response_cache.key(
+                cache_resource, upstream, path, query, scope
+            )
+            content = await response_cache.get(cache_key)
+            response_cache_requests.inc(
+                cache_resource, "miss" if content is None else "hit"
+            )
+            if content is not None:
+                return _decode(content, response_model)
+
+        validator_key = request_digest(upstream, path, query, scope)
+        validator = upstream_validators.get(validator_key)
+        if validator is not None:
+            headers["If-None-Match"] = validator[0]
+
+    async def send(trace_headers: dict[str, str]) -> httpx.Response:
+        return await client.request(
+            method,
+            path,
+            params=query,
+            json=body,
+            headers={**headers, **trace_headers},
+        )
+
+    try:
+        response = await _guarded(
+            upstream, send, idempotent=method == "GET", operation=operation
+        )
+        if validator is None or response.status_code != status.HTTP_304_NOT_MODIFIED:
+            response.raise_for_status()
+    except (CircuitOpenError, LimitExceededError) as exc:
+        raise _unavailable(exc) from exc
+    except httpx.RequestError as exc:
+        raise HTTPException(
+            status_code=status.HTTP_502_BAD_GATEWAY,
+            detail=_unreachable(upstream),
+        ) from exc
+    except httpx.HTTPStatusError as exc:
+        raise HTTPException(
+            status_code=exc.response.status_code,
+            detail=exc.response.text,
+        ) from exc
+
+    if validator is not None and response.status_code == status.HTTP_304_NOT_MODIFIED:
+        content = validator[1]
+    else:
+        content = response.content
+        etag = response.headers.get("ETag")
+        if validator_key is not None and etag is not None:
+            upstream_validators.set(
+                validator_key,
+                (etag, content),
+                ttl=get_settings().upstream_validators_ttl,
+            )
+
+    if cache_key is not None:
+        await response_cache.set(cache_resource, cache_key, content)
+    return _decode(content, response_model)
+
+
+def _decode(content: bytes, response_model: type[ModelT] | None) -> ModelT | None:
+    if response_model is None:
+        return None
+    started = time.perf_counter()
+    with start_span(f"validate {response_model.__qualname__}"):
+        # Validating the raw bytes skips building an intermediate dict tree
+        model = response_model.model_validate_json(content)
+    elapsed = time.perf_counter() - started
+    upstream_decode_duration.observe(elapsed, response_model.__qualname__)
+    record_timing("validate", elapsed, response_model.__qualname__)
+    return model
+
+
+async def stream_upstream(
+    upstream: str,
+    path: str,
+    token: str,
+    *,
+    operation: str,
+    params: dict[str, Any] | None = None,
+) -> AsyncIterator[bytes]:
+    """
+    Send a GET to an upstream service and pass its body through in chunks,
+    without buffering or validating it. Only for upstreams whose responses
+    are already checked against the schema.
+
+    The request is retried and guarded like a GET of `call_upstream`,
+    `operation` labels it the same way.
+
+    Raises:
+        HTTPException: like `call_upstream`, before the first chunk is sent
+    """
+    client = upstream_clients.get(upstream)
+    request = client.build_request(
+        "GET", path, params=clean_params(params), headers=create_header(token)
+    )
+
+    async def send(trace_headers: dict[str, str]) -> httpx.Response:
+        request.headers.update(trace_headers)
+        return await client.send(request, stream=True)
+
+    try:
+        response = await _guarded(upstream, send, idempotent=True, operation=operation)
+    except (CircuitOpenError, LimitExceededError) as exc:
+        raise _unavailable(exc) from exc
+    except httpx.RequestError as exc:
+        raise HTTPException(
+            status_code=status.HTTP_502_BAD_GATEWAY,
+            detail=_unreachable(upstream),
+        ) from exc
+
+    if response.is_error:
+        await response.aread()
+        await response.aclose()
+        raise HTTPException(
+            status_code=response.status_code,
+            detail=response.text,
+        )
+
+    async def chunks() -> AsyncIterator[bytes]:
+        try:
+            async for chunk in response.aiter_bytes():
+                yield chunk
+        finally:
+            await response.aclose()
+
+    return chunks()
@@ -0,0 +1,232 @@
+import asyncio
+import time
+from collections import deque
+from contextvars import ContextVar
+from typing import Awaitable, Callable, NoReturn
+
+from project.config import get_settings
+from project.db.models.enums import RequestPriorityEnum
+from project.upstream.clients import EPD, MAIL
+
+# Priority of the upstream calls of the current request
+request_priority: ContextVar[RequestPriorityEnum] = ContextVar(
+    "request_priority", default=RequestPriorityEnum.NORMAL
+)
+
+# Waiters are admitted in this order when a slot frees up
+PRIORITY_ORDER = (
+    RequestPriorityEnum.HIGH,
+    RequestPriorityEnum.NORMAL,
+    RequestPriorityEnum.LOW,
+)
+
+# Share of the wait queue a priority may fill, so low priority calls are shed
+# first when the queue grows
+QUEUE_SHARES = {
+    RequestPriorityEnum.HIGH: 1.0,
+    RequestPriorityEnum.NORMAL: 1.0,
+    RequestPriorityEnum.LOW: 0.25,
+}
+
+
+def set_request_priority(priority: RequestPriorityEnum) -> None:
+    """
+    Set the priority of the upstream calls made by the current request
+    """
+    request_priority.set(priority)
+
+
+def with_priority(
+    priority: RequestPriorityEnum,
+) -> Callable[[], Awaitable[None]]:
+    """
+    Route dependency that sets the priority of its upstream calls
+    """
+
+    async def dep() -> None:
+        set_request_priority(priority)
+
+    return dep
+
+
+class LimitExceededError(Exception):
+    """
+    Raised when an upstream call is shed by its concurrency limiter
+    """
+
+    def __init__(self, upstream: str, retry_after: float) -> None:
+        """
+        Args:
+            upstream: name of the upstream client
+            retry_after: seconds after which the client may try again
+        """
+        super().__init__(f"Concurrency limit of '{upstream}' reached")
+        self.upstream = upstream
+        self.retry_after = retry_after
+
+
+class AdaptiveLimiter:
+    """
+    Concurrency limit of the calls to one upstream, adapted with AIMD:
+    calls that stay under the latency target raise the limit by about one per
+    round of calls, a slow or failed call cuts it by `backoff`.
+    Calls over the limit wait in a bounded queue, served by priority.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        initial_limit: int,
+        min_limit: int,
+        max_limit: int,
+        latency_target: float,
+        backoff: float,
+        max_queue: int,
+        queue_timeout: float,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        """
+        Args:
+            name: name of the upstream client
+            initial_limit: concurrent calls allowed at startup
+            min_limit: lowest the limit can be cut to
+            max_limit: highest the limit can grow to, e.g. the pool size
+            latency_target: seconds above which a call counts as congestion
+            backoff: factor the limit is multiplied with on congestion
+            max_queue: calls that may wait for a slot
+            queue_timeout: seconds a call waits for a slot before it is shed
+            clock: monotonic clock used to time the calls
+        """
+        self.name = name
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.limit = float(min(max(initial_limit, min_limit), max_limit))
+        self.latency_target = latency_target
+        self.backoff = backoff
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._clock = clock
+        self.in_flight = 0
+        self.shed = 0
+        self._waiters: dict[RequestPriorityEnum, deque[asyncio.Future[None]]] = {
+            priority: deque() for priority in PRIORITY_ORDER
+        }
+        # Only one cut per latency target, a burst of slow calls that were
+        # all sent at the old limit is a single congestion signal
+        self._last_cut = float("-inf")
+
+    @property
+    def queued(self) -> int:
+        """
+        Calls waiting for a slot
+        """
+        return sum(len(waiters) for waiters in self._waiters.values())
+
+    async def acquire(self, priority: RequestPriorityEnum) -> None:
+        """
+        Take a slot, waiting in the queue when the limit is reached
+
+        Raises:
+            LimitExceededError: when the queue is full for `priority` or no
+                slot frees up within `queue_timeout`
+        """
+        if self.in_flight < int(self.limit) and self.queued == 0:
+            self.in_flight += 1
+            return
+
+        if self.queued >= self.max_queue * QUEUE_SHARES[priority]:
+            self._shed()
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters[priority].append(waiter)
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), self.queue_timeout)
+        except TimeoutError:
+            if waiter.done() and not waiter.cancelled():
+                # A slot was handed over just as the wait ran out
+                return
+            self._waiters[priority].remove(waiter)
+            self._shed()
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # Hand the slot that was just given to this call to the next
+                self.in_flight -= 1
+                self._admit()
+            elif waiter in self._waiters[priority]:
+                self._waiters[priority].remove(waiter)
+            raise
+
+    def release(self, latency: float, overloaded: bool) -> None:
+        """
+        Free a slot and adapt the limit to how the call went
+
+        Args:
+            latency: seconds the call took
+            overloaded: whether the call failed with a timeout or an
+                overload answer of the upstream
+        """
+        self.in_flight -= 1
+
+        now = self._clock()
+        if overloaded or latency > self.latency_target:
+            if now - self._last_cut >= self.latency_target:
+                self.limit = max(self.limit * self.backoff, self.min_limit)
+                self._last_cut = now
+        elif self.in_flight + 1 >= int(self.limit):
+            # Only grow while the limit is actually used
+            self.limit = min(self.limit + 1 / self.limit, self.max_limit)
+
+        self._admit()
+
+    def stats(self) -> dict[str, int | float]:
+        """
+        Limit and usage of the limiter, for monitoring
+        """
+        return {
+            "limit": round(self.limit, 2),
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "shed": self.shed,
+        }
+
+    def _admit(self) -> None:
+        for priority in PRIORITY_ORDER:
+            waiters = self._waiters[priority]
+            while waiters and self.in_flight < int(self.limit):
+                waiter = waiters.popleft()
+                if waiter.done():
+                    continue
+                self.in_flight += 1
+                waiter.set_result(None)
+
+    def _shed(self) -> NoReturn:
+        self.shed += 1
+        raise LimitExceededError(self.name, retry_after=self.queue_timeout)
+
+
+def build_limiters() -> dict[str, AdaptiveLimiter]:
+    """
+    Create the limiter of every upstream service from the settings, the pool
+    size of an upstream is its maximum limit
+    """
+    settings = get_settings()
+    pool_sizes = {
+        EPD: settings.epd_max_connections,
+        MAIL: settings.mail_max_connections,
+    }
+    return {
+        name: AdaptiveLimiter(
+            name,
+            initial_limit=settings.upstream_limit_initial,
+            min_limit=settings.upstream_limit_min,
+            max_limit=pool_size,
+            latency_target=settings.upstream_latency_target,
+            backoff=settings.upstream_limit_backoff,
+            max_queue=settings.upstream_queue_size,
+            queue_timeout=settings.upstream_queue_timeout,
+        )
+        for name, pool_size in pool_sizes.items()
+    }
+
+
+upstream_limiters = build_limiters()
@@ -0,0 +1,259 @@
+import asyncio
+import random
+import time
+from typing import Awaitable, Callable
+
+import httpx
+
+from project.config import get_settings
+from project.db.models.enums import BreakerStateEnum
+from project.upstream.clients import EPD, MAIL
+
+# Upstream answers that are worth a retry and count as a failure of the upstream
+RETRYABLE_STATUSES = frozenset({502, 503, 504})
+
+
+class CircuitOpenError(Exception):
+    """
+    Raised instead of calling an upstream whose circuit breaker is open
+    """
+
+    def __init__(self, upstream: str, retry_after: float) -> None:
+        """
+        Args:
+            upstream: name of the upstream client
+            retry_after: seconds until the breaker lets a probe through
+        """
+        super().__init__(f"Circuit breaker of '{upstream}' is open")
+        self.upstream = upstream
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """
+    Stops calling an upstream after `failure_threshold` failures in a row.
+    Once `recovery_time` has passed a single probe is let through, its success
+    closes the breaker again and its failure keeps it open.
+    """
+
+    def __init__(
+        self,
+        failure_threshold: int,
+        recovery_time: float,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        """
+        Args:
+            failure_threshold: consecutive failures that open the breaker
+            recovery_time: seconds the breaker stays open before a probe
+            clock: monotonic clock used for the recovery time
+        """
+        self.failure_threshold = failure_threshold
+        self.recovery_time = recovery_time
+        self._clock = clock
+        self.state = BreakerStateEnum.CLOSED
+        self.failures = 0
+        self.opened = 0
+        self._opened_at = 0.0
+
+    def retry_after(self) -> float:
+        """
+        Seconds until the next probe is let through, 0 when closed
+        """
+        if self.state == BreakerStateEnum.CLOSED:
+            return 0.0
+        return max(self._opened_at + self.recovery_time - self._clock(), 0.0)
+
+    def allow(self) -> bool:
+        """
+        Whether a call may be sent now
+        """
+        if self.state == BreakerStateEnum.CLOSED:
+            return True
+        if self.retry_after() > 0:
+            return False
+        # Let one probe through, another one follows when it never finishes
+        self.state = BreakerStateEnum.HALF_OPEN
+        self._opened_at = self._clock()
+        return True
+
+    def record_success(self) -> None:
+        """
+        Close the breaker after a successful call
+        """
+        self.state = BreakerStateEnum.CLOSED
+        self.failures = 0
+
+    def record_failure(self) -> None:
+        """
+        Count a failed call, opening the breaker at the threshold or when the
+        probe failed
+        """
+        self.failures += 1
+        if (
+            self.state == BreakerStateEnum.HALF_OPEN
+            or self.failures >= self.failure_threshold
+        ):
+            if self.state != BreakerStateEnum.OPEN:
+                self.opened += 1
+            self.state = BreakerStateEnum.OPEN
+            self._opened_at = self._clock()
+
+    def stats(self) -> dict[str, str | int | float]:
+        """
+        State of the breaker, for monitoring
+        """
+        return {
+            "state": self.state.value,
+            "failures": self.failures,
+            "opened": self.opened,
+            "retry_after": round(self.retry_after(), 3),
+        }
+
+
+class RetryBudget:
+    """
+    Caps retries to a fraction of the calls, so retries can't multiply the
+    load on an upstream that is already struggling. Every call deposits
+    `ratio` of a retry, a retry withdraws a whole one and `min_per_second`
+    retries are always available at a low request rate.
+    """
+
+    def __init__(
+        self,
+        ratio: float,
+        min_per_second: float,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        """
+        Args:
+            ratio: retries allowed per call
+            min_per_second: retries allowed per second regardless of the calls
+            clock: monotonic clock used to refill the minimum
+        """
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self._clock = clock
+        # Unused retries are kept for at most ten seconds of traffic
+        self._max_balance = max(min_per_second * 10, 1.0)
+        self._balance = self._max_balance
+        self._updated_at = clock()
+        self.exhausted = 0
+
+    def deposit(self) -> None:
+        """
+        Account for a call
+        """
+        self._refill(self.ratio)
+
+    def try_withdraw(self) -> bool:
+        """
+        Take a retry from the budget, False when it is used up
+        """
+        self._refill(0.0)
+        if self._balance < 1:
+            self.exhausted += 1
+            return False
+        self._balance -= 1
+        return True
+
+    def _refill(self, amount: float) -> None:
+        now = self._clock()
+        amount += (now - self._updated_at) * self.min_per_second
+        self._updated_at = now
+        self._balance = min(self._balance + amount, self._max_balance)
+
+
+class UpstreamGuard:
+    """
+    Circuit breaker and retries of the calls to one upstream
+    """
+
+    def __init__(
+        self,
+        name: str,
+        breaker: CircuitBreaker,
+        budget: RetryBudget,
+        max_retries: int,
+        backoff: float,
+    ) -> None:
+        """
+        Args:
+            name: name of the upstream client
+            breaker: circuit breaker of the upstream
+            budget: retry budget of the upstream
+            max_retries: retries of a single idempotent call
+            backoff: base delay in seconds, retry n waits a random time
+                up to `backoff * 2**n` (full jitter)
+        """
+        self.name = name
+        self.breaker = breaker
+        self.budget = budget
+        self.max_retries = max_retries
+        self.backoff = backoff
+
+    async def call(
+        self, send: Callable[[], Awaitable[httpx.Response]], idempotent: bool
+    ) -> httpx.Response:
+        """
+        Send a request through the breaker, retrying idempotent requests on
+        connection errors, timeouts and 502/503/504 answers.
+
+        Raises:
+            CircuitOpenError: when the breaker is open
+            httpx.RequestError: when the last attempt could not be sent
+        """
+        if not self.breaker.allow():
+            raise CircuitOpenError(self.name, self.breaker.retry_after())
+        self.budget.deposit()
+
+        attempt = 0
+        while True:
+            try:
+                response = await send()
+            except httpx.RequestError:
+                self.breaker.record_failure()
+                if not self._may_retry(idempotent, attempt):
+                    raise
+            else:
+                if response.status_code not in RETRYABLE_STATUSES:
+                    self.breaker.record_success()
+                    return response
+                self.breaker.record_failure()
+                if not self._may_retry(idempotent, attempt):
+                    return response
+                await response.aclose()
+
+            await asyncio.sleep(random.uniform(0, self.backoff * 2**attempt))
+            attempt += 1
+            if not self.breaker.allow():
+                raise CircuitOpenError(self.name, self.breaker.retry_after())
+
+    def _may_retry(self, idempotent: bool, attempt: int) -> bool:
+        return idempotent and attempt < self.max_retries and self.budget.try_withdraw()
+
+
+def build_guards() -> dict[str, UpstreamGuard]:
+    """
+    Create the guard of every upstream service from the settings
+    """
+    settings = get_settings()
+    return {
+        name: UpstreamGuard(
+            name,
+            breaker=CircuitBreaker(
+                failure_threshold=settings.upstream_breaker_failure_threshold,
+                recovery_time=settings.upstream_breaker_recovery_time,
+            ),
+            budget=RetryBudget(
+                ratio=settings.upstream_retry_budget_ratio,
+                min_per_second=settings.upstream_retry_budget_min_per_second,
+            ),
+            max_retries=settings.upstream_max_retries,
+            backoff=settings.upstream_retry_backoff,
+        )
+        for name in (EPD, MAIL)
+    }
+
+
+upstream_guards = build_guards()
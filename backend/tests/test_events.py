@@ -0,0 +1,57 @@
+import asyncio
+
+from project.db.models.enums import EventActionEnum, EventTopicEnum
+from project.db.models.event import EventOut
+from project.events import (
+    KEEPALIVE,
+    EventBroker,
+    Subscription,
+    encode_event,
+    event_broker,
+)
+from project.routes.events import get_events
+
+
+def mail_event(mail_id: str, user_id: str) -> EventOut:
+    return EventOut(
+        topic=EventTopicEnum.MAILS,
+        action=EventActionEnum.CREATED,
+        id=mail_id,
+        userId=user_id,
+    )
+
+
+def test_mail_events_only_reach_their_user() -> None:
+    broker = EventBroker()
+    user_a = broker.subscribe([EventTopicEnum.MAILS], max_size=10, user_id="a")
+    admin = broker.subscribe([EventTopicEnum.MAILS], max_size=10)
+
+    broker.publish(mail_event("1", user_id="b"))
+    broker.publish(mail_event("2", user_id="a"))
+
+    async def frames(subscription: Subscription) -> list[bytes]:
+        received = []
+        while (frame := await subscription.get(timeout=0.01)) != KEEPALIVE:
+            received.append(frame)
+        return received
+
+    assert asyncio.run(frames(user_a)) == [encode_event(mail_event("2", "a"))]
+    assert len(asyncio.run(frames(admin))) == 2
+
+
+def test_event_stream_of_user_a_skips_mail_of_user_b() -> None:
+    async def first_event(claims: dict) -> bytes:
+        response = await get_events(claims=claims, topics="mails")
+        frames = response.body_iterator
+        assert await anext(frames) == KEEPALIVE
+
+        event_broker.publish(mail_event("1", user_id="b"))
+        event_broker.publish(mail_event("2", user_id="a"))
+        try:
+            return await anext(frames)
+        finally:
+            await frames.aclose()
+
+    frame = asyncio.run(first_event({"scope": "mails:get", "sub": "a"}))
+
+    assert frame == encode_event(mail_event("2", user_id="a"))
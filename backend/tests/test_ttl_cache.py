@@ -0,0 +1,58 @@
+from project.ttl_cache import TTLCache
+
+
+def make_cache(max_size: int = 10, max_weight: int = 10) -> TTLCache[str]:
+    return TTLCache(max_size=max_size, max_weight=max_weight, weigh=len)
+
+
+def test_set_evicts_least_recently_used_over_weight() -> None:
+    cache = make_cache()
+    cache.set("a", "aaaa", ttl=60)
+    cache.set("b", "bbbb", ttl=60)
+    cache.set("c", "cccc", ttl=60)
+
+    assert cache.peek("a") is None
+    assert cache.weight == 8
+    assert cache.evictions == 1
+
+
+def test_set_skips_value_heavier_than_limit() -> None:
+    cache = make_cache()
+    cache.set("a", "a" * 11, ttl=60)
+
+    assert cache.peek("a") is None
+    assert cache.weight == 0
+
+
+def test_replace_with_larger_value_evicts_others() -> None:
+    cache = make_cache()
+    cache.set("a", "aaaa", ttl=60)
+    cache.set("b", "bbbb", ttl=60)
+
+    cache.replace("a", "aaaaaaaa")
+
+    assert cache.peek("a") == "aaaaaaaa"
+    assert cache.peek("b") is None
+    assert cache.weight == 8
+    assert cache.weight <= cache.max_weight
+
+
+def test_replace_heavier_than_limit_removes_entry() -> None:
+    cache = make_cache()
+    cache.set("a", "aaaa", ttl=60)
+
+    cache.replace("a", "a" * 11)
+
+    assert cache.peek("a") is None
+    assert cache.weight == 0
+
+
+def test_replace_keeps_expiry() -> None:
+    now = [0.0]
+    cache: TTLCache[str] = TTLCache(max_size=10, clock=lambda: now[0])
+    cache.set("a", "x", ttl=10)
+    now[0] = 5.0
+    cache.replace("a", "y")
+    now[0] = 10.0
+
+    assert cache.peek("a") is None